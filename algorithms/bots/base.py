@@ -1,16 +1,24 @@
-import asyncio
 import logging
+import time
 from abc import ABC, abstractmethod
 from datetime import datetime
+from typing import Sequence
 
-from config.settings import SessionLocal
-from models.models_ import Bot, Transaction
 from algorithms.bots.base_enums import BotAction, BotStatus, BotMoneyMode, ReturnType
 from exceptions.bot_exceptions import BotIsNotRunningError, BotModeIsNotConfiguredError
-from api.data_api.buy_sell import buy_pair, sell_pair
+from services.order_executor import order_executor, OrderIntent
+from services.transaction_journal import transaction_journal
+from services.status_writer import bot_status_writer
 
 
 class BotBase(ABC):
+    # Whether bot can skip intermediate prices and get only the latest one when it falls behind
+    coalesce_ticks = False
+
+    # Bots have no __dict__, so every subclass declares slots of its own state
+    __slots__ = ('id', 'key_id', 'status', 'money_mode', 'pair', 'invested_in_pair',
+                 'quote_asset_balance', 'base_asset_balance', 'total_balance_in_quote_asset', 'commission')
+
     def __init__(self):
         self.id = None
         self.key_id = None
@@ -29,13 +37,25 @@ class BotBase(ABC):
         return f'Name = {self.__class__.__name__}, id={self.id}'
 
     @abstractmethod
-    def start(self) -> None:
+    def start(self, history: Sequence = None) -> None:
+        # history: stored prices of the pair (oldest first) to warm up from instead of live ticks
         pass
 
     @abstractmethod
     def step(self, new_price: float) -> None:
         pass
 
+    def on_restore(self) -> None:
+        # Called after bot is unpickled in another process, background work is not pickled and should be restarted
+        pass
+
+    def update_parameters(self, parameters: dict) -> None:
+        for key, value in parameters.items():
+            try:
+                setattr(self, key, value)
+            except AttributeError:
+                logging.warning(f'Bot={self} has no parameter {key}, it is not updated')
+
     def recalculate_total_balance(self, price: float = None):
         if price:
             self.total_balance_in_quote_asset = self.quote_asset_balance + self.base_asset_balance * price
@@ -47,82 +67,95 @@ class BotBase(ABC):
         self.status = BotStatus.STOPPED
 
         # Set status in db
-        db = SessionLocal()
-        bot = db.query(Bot).get(self.id)
-        bot.status = BotStatus.STOPPED
-        db.commit()
+        bot_status_writer.set(self.id, BotStatus.STOPPED)
 
     def buy(self, quote_amount: float, price: float):
         logging.info(f'Buy on {self.pair} with price={price} by bot={self}')
-        db = SessionLocal()
 
         if self.money_mode == BotMoneyMode.REAL:
-            loop = asyncio.get_event_loop()
-            order = loop.run_until_complete(buy_pair(self.pair, self.key_id, quote_asset_quantity=quote_amount, db=db))
-            price = order['price']
-            base_asset_bought = order['base_asset_bought']
-            quote_asset_sold = order['quote_asset_sold']
-        else:
-            # Paper money
-            base_asset_bought = quote_amount / price * (1 - self.commission)
-            quote_asset_sold = quote_amount
-
-        # Update balances
-        self.base_asset_balance += base_asset_bought
-        self.quote_asset_balance -= quote_asset_sold
-        self.recalculate_total_balance(price)
+            self.submit_order(BotAction.BUY, quote_amount, price)
+            return
 
-        # Add transaction to db
-        transaction = Transaction(
-            bot_id=self.id,
-            date=datetime.now(),
-            price=price,
-            base_asset_amount=base_asset_bought,
-            quote_asset_amount=quote_asset_sold,
-            base_asset_balance=self.base_asset_balance,
-            quote_asset_balance=self.quote_asset_balance,
-            total_balance_in_quote_asset=self.total_balance_in_quote_asset,
-            type=BotAction.BUY,
-            money_mode=self.money_mode
-        )
-        db.add(transaction)
-        db.commit()
+        # Paper money
+        base_asset_bought = quote_amount / price * (1 - self.commission)
+        quote_asset_sold = quote_amount
+        self.apply_trade(BotAction.BUY, price, base_asset_bought, quote_asset_sold)
 
     def sell(self, quote_amount: float, price: float):
         logging.info(f'Sell on {self.pair} with price={price} by bot={self}')
-        db = SessionLocal()
 
         if self.money_mode == BotMoneyMode.REAL:
-            loop = asyncio.get_event_loop()
-            order = loop.run_until_complete(sell_pair(self.pair, self.key_id, quote_asset_quantity=quote_amount, db=db))
-            price = order['price']
-            base_asset_sold = order['base_asset_sold']
-            quote_asset_bought = order['quote_asset_bought']
+            self.submit_order(BotAction.SELL, quote_amount, price)
+            return
+
+        # Paper money
+        base_asset_sold = quote_amount / price
+        quote_asset_bought = quote_amount * (1 - self.commission)
+        self.apply_trade(BotAction.SELL, price, base_asset_sold, quote_asset_bought)
+
+    def submit_order(self, action: BotAction, quote_amount: float, price: float):
+        # Reserve assets until the order is filled, so next steps don't spend them twice
+        if action == BotAction.BUY:
+            reserved_amount = quote_amount
+            self.quote_asset_balance -= reserved_amount
+        else:
+            reserved_amount = quote_amount / price
+            self.base_asset_balance -= reserved_amount
+
+        order_executor.submit(OrderIntent(self, action, quote_amount, price, reserved_amount, time.time()))
+
+    def cancel_order(self, intent: OrderIntent):
+        logging.info(f'Order {intent.action.name} of bot={self} is cancelled')
+
+        # Give reserved assets back
+        if intent.action == BotAction.BUY:
+            self.quote_asset_balance += intent.reserved_amount
+        else:
+            self.base_asset_balance += intent.reserved_amount
+        self.recalculate_total_balance(intent.price)
+
+        self.on_order_result(intent.action, is_filled=False)
+
+    def apply_fill(self, intent: OrderIntent, price: float, base_amount: float, quote_amount: float):
+        logging.info(f'Order {intent.action.name} of bot={self} is filled with price={price}')
+
+        # Replace reserved assets with the real fill
+        if intent.action == BotAction.BUY:
+            self.quote_asset_balance += intent.reserved_amount
         else:
-            # Paper money
-            base_asset_sold = quote_amount / price
-            quote_asset_bought = quote_amount * (1 - self.commission)
+            self.base_asset_balance += intent.reserved_amount
+        self.apply_trade(intent.action, price, base_amount, quote_amount)
+
+        self.on_order_result(intent.action, is_filled=True)
 
+    def on_order_result(self, action: BotAction, is_filled: bool) -> None:
+        # Called under the bot lock when a real money order is filled or cancelled.
+        # Bots which take position on submit should give it back when the order is cancelled
+        pass
+
+    def apply_trade(self, action: BotAction, price: float, base_amount: float, quote_amount: float):
         # Update balances
-        self.base_asset_balance -= base_asset_sold
-        self.quote_asset_balance += quote_asset_bought
+        if action == BotAction.BUY:
+            self.base_asset_balance += base_amount
+            self.quote_asset_balance -= quote_amount
+        else:
+            self.base_asset_balance -= base_amount
+            self.quote_asset_balance += quote_amount
         self.recalculate_total_balance(price)
 
-        # Add transaction to db
-        transaction = Transaction(
+        # Add transaction to the journal, it is written to db in batches
+        transaction_journal.append(dict(
             bot_id=self.id,
             date=datetime.now(),
             price=price,
-            base_asset_amount=base_asset_sold,
-            quote_asset_amount=quote_asset_bought,
+            base_asset_amount=base_amount,
+            quote_asset_amount=quote_amount,
             base_asset_balance=self.base_asset_balance,
             quote_asset_balance=self.quote_asset_balance,
             total_balance_in_quote_asset=self.total_balance_in_quote_asset,
-            type=BotAction.SELL,
+            type=action,
             money_mode=self.money_mode
-        )
-        db.add(transaction)
-        db.commit()
+        ))
 
     def verbose_total_balance(self, price: float):
         money = self.base_asset_balance / price + self.quote_asset_balance
@@ -136,10 +169,7 @@ class BotBase(ABC):
         self.status = BotStatus.LOADING
 
         # Set status in db
-        db = SessionLocal()
-        bot = db.query(Bot).get(self.id)
-        bot.status = BotStatus.LOADING
-        db.commit()
+        bot_status_writer.set(self.id, BotStatus.LOADING)
 
     def set_running(self):
         logging.info(f'Set running for bot {self}')
@@ -148,7 +178,4 @@ class BotBase(ABC):
         self.status = BotStatus.RUNNING
 
         # Set status in db
-        db = SessionLocal()
-        bot = db.query(Bot).get(self.id)
-        bot.status = BotStatus.RUNNING
-        db.commit()
+        bot_status_writer.set(self.id, BotStatus.RUNNING)
@@ -1,11 +1,17 @@
 import time
 from enum import Enum
+from typing import Sequence
 
 from algorithms.bots.base import BotBase, BotMoneyMode, ReturnType, BotStatus
 from algorithms.bots.base_enums import InvestmentIntervalScale
 
 
 class DCABot(BotBase):
+    coalesce_ticks = True
+
+    __slots__ = ('return_type', 'investment_money', 'investment_interval', 'investment_interval_scale',
+                 'investment_interval_in_seconds', 'next_investment_time')
+
     def __init__(self,
                  id: int,
                  key_id: int,
@@ -17,7 +23,9 @@ class DCABot(BotBase):
                  return_type: ReturnType,
                  investment_money: float,
                  investment_interval: int,
-                 investment_interval_scale: InvestmentIntervalScale):
+                 investment_interval_scale: InvestmentIntervalScale,
+                 history: Sequence = None,
+                 autostart: bool = True):
         super().__init__()
         self.id = id
         self.key_id = key_id
@@ -33,9 +41,11 @@ class DCABot(BotBase):
 
         self.next_investment_time = 0.
 
-        self.start()
+        # In sharded mode bot is started by its shard
+        if autostart:
+            self.start(history)
 
-    def start(self) -> None:
+    def start(self, history: Sequence = None) -> None:
         self.next_investment_time = time.time()
         self.set_running()
 
@@ -1,11 +1,17 @@
 import logging
 import numpy as np
 from enum import Enum
+from typing import Sequence
 from algorithms.bots.base import BotBase, BotMoneyMode, ReturnType, BotStatus
 from algorithms.bots.base_enums import RunningMode
 
 
 class GridBot(BotBase):
+    coalesce_ticks = True
+
+    __slots__ = ('min_level', 'max_level', 'max_money_to_invest', 'reserved_money', 'return_type', 'levels',
+                 'levels_amount', 'money_to_trade', 'invested_amount', 'boundary_factor', 'running_mode')
+
     def __init__(self,
                  id: int,
                  key_id: int,
@@ -18,7 +24,9 @@ class GridBot(BotBase):
                  return_type: ReturnType,
                  levels_amount: int,
                  running_mode: RunningMode,
-                 boundary_factor: float = 0.1):
+                 boundary_factor: float = 0.1,
+                 history: Sequence = None,
+                 autostart: bool = True):
         super().__init__()
         self.id = id
         self.key_id = key_id
@@ -41,7 +49,9 @@ class GridBot(BotBase):
         self.boundary_factor = boundary_factor
         self.running_mode = running_mode
 
-        self.start()
+        # In sharded mode bot is started by its shard
+        if autostart:
+            self.start(history)
 
     def check_parameters(self):
         if self.levels_amount <= 0 or self.levels_amount > 50:
@@ -83,10 +93,14 @@ class GridBot(BotBase):
 
         return buy_amount
 
-    def start(self) -> None:
+    def start(self, history: Sequence = None) -> None:
         self.check_parameters()
         self.set_loading()
 
+        # Build the grid around the latest stored price
+        if history:
+            self.loading_step(history[-1])
+
     def step(self, new_price: float) -> None:
         logging.info(f'Step for bot={self}')
 
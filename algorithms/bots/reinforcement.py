@@ -2,12 +2,13 @@ import itertools
 import logging
 import numpy as np
 import pandas as pd
-import requests
 import threading
+from typing import Sequence
 
-from config.settings import DATA_API_URI
 from algorithms.bots.base import BotBase, BotStatus, BotMoneyMode, ReturnType
+from algorithms.bots.base_enums import BotAction
 from algorithms.preprocessing.returns import get_log_returns
+from algorithms.optimization.search_cache import get_price_snapshot
 
 
 feats = ['LogReturn']
@@ -180,6 +181,13 @@ def get_is_invested(states):
 
 
 class ReinforcementBot(BotBase):
+    test_ratio = 0.1
+    num_episodes = 500
+
+    # Only the trained agent is kept, training data and environments are released after training
+    __slots__ = ('min_level', 'max_level', 'max_money_to_invest', 'return_type', 'state_mapper', 'agent',
+                 'last_price', 'hold')
+
     def __init__(self,
                  id: int,
                  key_id: int,
@@ -188,7 +196,9 @@ class ReinforcementBot(BotBase):
                  max_level: float,
                  max_money_to_invest: float,
                  money_mode: BotMoneyMode,
-                 return_type: ReturnType):
+                 return_type: ReturnType,
+                 history: Sequence = None,
+                 autostart: bool = True):
         super().__init__()
 
         self.id = id
@@ -200,28 +210,27 @@ class ReinforcementBot(BotBase):
         self.money_mode = money_mode
         self.return_type = return_type
 
-        self.train_data = None
-        self.test_data = None
-        self.train_env = None
-        self.test_env = None
         self.state_mapper = None
         self.agent = None
 
-        self.test_ratio = 0.1
-        self.num_episodes = 500
         self.last_price = None
 
         self.hold = False
 
         # todo: maybe start in other thread
-        self.start()
+        # In sharded mode bot is started by its shard
+        if autostart:
+            self.start(history)
 
-    def start(self) -> None:
+    def start(self, history: Sequence = None) -> None:
         self.set_loading()
 
         def loading_stuff():
-            response = requests.get(f'{DATA_API_URI}/api/get-tick-prices/{self.pair}')
-            log_returns = get_log_returns(response.json()['prices'])
+            if history is not None:
+                prices = history
+            else:
+                prices = get_price_snapshot(self.pair)
+            log_returns = get_log_returns(prices)
 
             # Prepare data
             data = pd.DataFrame({
@@ -231,39 +240,56 @@ class ReinforcementBot(BotBase):
 
             # Split into train and test
             n_test = int(len(data) * self.test_ratio)
-            self.train_data = data.iloc[:-n_test]
-            self.test_data = data.iloc[-n_test:]
+            train_data = data.iloc[:-n_test]
+            test_data = data.iloc[-n_test:]
 
             # Prepare environments
-            self.train_env = Env(self.train_data)
-            self.test_env = Env(self.test_data)
+            train_env = Env(train_data)
+            test_env = Env(test_data)
 
             # Prepare agent & StateMapper
-            action_size = len(self.train_env.action_space)
-            self.state_mapper = StateMapper(self.train_env)
-            self.agent = Agent(action_size, self.state_mapper)
+            action_size = len(train_env.action_space)
+            state_mapper = StateMapper(train_env)
+            agent = Agent(action_size, state_mapper)
 
             # Prepare rewards
             train_rewards = np.empty(self.num_episodes)
             test_rewards = np.empty(self.num_episodes)
 
             for episode in range(self.num_episodes):
-                train_reward = play_one_episode(self.agent, self.train_env, is_train=True)
+                train_reward = play_one_episode(agent, train_env, is_train=True)
                 train_rewards[episode] = train_reward
 
                 # test on the test set
-                tmp_epsilon = self.agent.epsilon
-                self.agent.epsilon = 0.
-                test_reward = play_one_episode(self.agent, self.test_env, is_train=False)
-                self.agent.epsilon = tmp_epsilon
+                tmp_epsilon = agent.epsilon
+                agent.epsilon = 0.
+                test_reward = play_one_episode(agent, test_env, is_train=False)
+                agent.epsilon = tmp_epsilon
                 test_rewards[episode] = test_reward
 
                 logging.info(f"Bot:{self}, eps: {episode + 1}/{self.num_episodes}, train: {train_reward:.5f}, test: {test_reward:.5f}")
 
-        t = threading.Thread(target=loading_stuff, daemon=True)
-        t.start()
+            # Bot is not stepped before the agent is published
+            self.state_mapper = state_mapper
+            self.agent = agent
+
+        # With stored history caller is already a background worker
+        if history is not None:
+            loading_stuff()
+        else:
+            t = threading.Thread(target=loading_stuff, daemon=True)
+            t.start()
         # self.set_running()
 
+    def on_restore(self) -> None:
+        if self.agent is None:
+            self.start()
+
+    def on_order_result(self, action: BotAction, is_filled: bool) -> None:
+        # Holding is set on submit, cancelled order gives it back
+        if not is_filled:
+            self.hold = action == BotAction.SELL
+
     def step(self, new_price) -> None:
         if self.status != BotStatus.RUNNING:
             self.last_price = new_price
@@ -3,20 +3,22 @@ import numpy as np
 import pandas as pd
 import pandera as pa
 import threading
-import requests
 from typing import Sequence, NamedTuple
-from copy import copy
-from config.settings import DATA_API_URI
+from config.settings import TREND_FOLLOWING_SEARCH_MODE, TREND_FOLLOWING_HALVING_ETA, \
+    WALK_FORWARD_INTERVAL
 
 from algorithms.bots.base import BotBase, ReturnType, BotMoneyMode, BotStatus
-from algorithms.preprocessing.returns import (
-    get_log_returns, get_returns, from_log_returns_to_factor, from_returns_to_factor
-)
+from algorithms.bots.base_enums import BotAction
+from algorithms.preprocessing.returns import from_log_returns_to_factor, from_returns_to_factor
+from algorithms.optimization.sma_search import get_price_returns, search_moving_windows, \
+    search_moving_windows_halving
+from algorithms.optimization.search_cache import search_cache, get_prices_fingerprint, get_price_snapshot
+from algorithms.statistics.rolling_mean import RollingMean
 
 
 class ScoreDataFrameSchema(pa.DataFrameModel):
     Price: pa.typing.Series[float]
-    LogReturn: pa.typing.Series[float or np.nan]
+    AnyReturn: pa.typing.Series[float]
 
 
 class MovingWindows(NamedTuple):
@@ -25,6 +27,17 @@ class MovingWindows(NamedTuple):
 
 
 class TrendFollowingBot(BotBase):
+    # Window prices are kept in ring buffers of doubles, SMAs are updated in O(1) per tick
+    __slots__ = ('min_level', 'max_level', 'max_money_to_invest', 'return_type', 'slow_window', 'fast_window',
+                 'fast_min', 'fast_max', 'slow_max', 'fast_slow_min_delta',
+                 'slow_sma', 'fast_sma', 'slow_rolling_mean', 'fast_rolling_mean', 'is_learning', 'adaptive_windows')
+
+    # Bounds of windows search when they are not provided
+    default_fast_min = 1
+    default_fast_max = 100
+    default_slow_max = 150
+    default_fast_slow_min_delta = 1
+
     def __init__(self,
                  id: int,
                  key_id: int,
@@ -39,7 +52,9 @@ class TrendFollowingBot(BotBase):
                  fast_min: int = None,
                  fast_max: int = None,
                  slow_max: int = None,
-                 fast_slow_min_delta: int = None):
+                 fast_slow_min_delta: int = None,
+                 history: Sequence = None,
+                 autostart: bool = True):
         super().__init__()
         self.id = id
         self.key_id = key_id
@@ -53,16 +68,24 @@ class TrendFollowingBot(BotBase):
         self.slow_window = slow_window
         self.fast_window = fast_window
 
-        self.loading_prices = []
+        self.fast_min = fast_min if fast_min is not None else self.default_fast_min
+        self.fast_max = fast_max if fast_max is not None else self.default_fast_max
+        self.slow_max = slow_max if slow_max is not None else self.default_slow_max
+        self.fast_slow_min_delta = fast_slow_min_delta if fast_slow_min_delta is not None \
+            else self.default_fast_slow_min_delta
 
         self.slow_sma = None
         self.fast_sma = None
-        self.slow_window_prices = None
-        self.fast_window_prices = None
+        self.slow_rolling_mean = None
+        self.fast_rolling_mean = None
         self.is_learning = False
+        # Searched windows are re-optimized by the walk-forward job, windows provided by user are kept
+        self.adaptive_windows = False
 
         self.recalculate_total_balance()
-        self.start()
+        # In sharded mode bot is started by its shard
+        if autostart:
+            self.start(history)
 
     @staticmethod
     def check_sma_values(slow_window: int, fast_window: int, upper_bound: int) -> None:
@@ -73,27 +96,121 @@ class TrendFollowingBot(BotBase):
         if slow_window > upper_bound:
             raise ValueError(f'Too high value of slow MA. It should be less than {upper_bound}')
 
-    def start(self) -> None:
+    def start(self, history: Sequence = None) -> None:
         self.set_loading()
 
         if self.slow_window and self.fast_window:
             self.check_sma_values(self.slow_window, self.fast_window, 200)
+            self.reset_windows()
+            if history is not None:
+                self.warm_up(history)
         else:
             self.is_learning = True
-            response = requests.get(f'{DATA_API_URI}/api/get-tick-prices/{self.pair}')
-            prices = response.json()['prices']
+            if history is not None:
+                prices = history
+            else:
+                prices = get_price_snapshot(self.pair)
 
             def learn():
-                best_moving_windows = self.search_parameters(prices, fast_min=1, fast_max=100,
-                                                             slow_max=150, fast_slow_min_delta=1)
+                best_moving_windows = self.search_parameters(prices, fast_min=self.fast_min, fast_max=self.fast_max,
+                                                             slow_max=self.slow_max,
+                                                             fast_slow_min_delta=self.fast_slow_min_delta)
+                if best_moving_windows.slow_window is None:
+                    logging.error(f'Bot={self} has too short history of {len(prices)} prices to search windows')
+                    return
+
                 self.slow_window = best_moving_windows.slow_window
                 self.fast_window = best_moving_windows.fast_window
+                self.adaptive_windows = True
+                self.reset_windows()
 
                 self.is_learning = False
+                if history is not None:
+                    self.warm_up(history)
+
+            # With stored history caller is already a background worker
+            if history is not None:
+                learn()
+            else:
+                t = threading.Thread(target=learn, daemon=True)
+                t.start()
+
+    def reset_windows(self) -> None:
+        # Adaptive bots keep prices for the slowest window of the search, so windows can be swapped in place
+        capacity = self.slow_window
+        if self.adaptive_windows and WALK_FORWARD_INTERVAL > 0:
+            capacity = max(capacity, self.slow_max)
+
+        self.slow_rolling_mean = RollingMean(self.slow_window, capacity=capacity)
+        self.fast_rolling_mean = RollingMean(self.fast_window)
+
+    def set_windows(self, slow_window: int, fast_window: int) -> bool:
+        """
+        Swaps windows of a loaded bot in place, SMAs are rebuilt from the latest stored prices.
+        Should be called under the bot lock. Returns False when not enough prices are stored for the new windows.
+        """
+        self.check_sma_values(slow_window, fast_window, 200)
+        if self.is_learning or self.slow_rolling_mean is None or slow_window > self.slow_rolling_mean.capacity \
+                or self.slow_rolling_mean.size < slow_window:
+            return False
+
+        self.slow_rolling_mean.set_window(slow_window)
+        self.fast_rolling_mean = RollingMean(fast_window, self.slow_rolling_mean.latest(fast_window))
+        self.slow_window = slow_window
+        self.fast_window = fast_window
+        return True
+
+    def update_parameters(self, parameters: dict) -> None:
+        windows_parameters = {key: parameters[key] for key in ('slow_window', 'fast_window') if key in parameters}
+        slow_window = windows_parameters.get('slow_window', self.slow_window)
+        fast_window = windows_parameters.get('fast_window', self.fast_window)
+        if windows_parameters:
+            self.check_sma_values(slow_window, fast_window, 200)
+
+        super().update_parameters({key: value for key, value in parameters.items() if key not in windows_parameters})
+        if not windows_parameters:
+            return
+
+        # Windows set by user are kept by the walk-forward job
+        self.adaptive_windows = False
+
+        # Windows are not built yet
+        if self.slow_rolling_mean is None:
+            self.slow_window = slow_window
+            self.fast_window = fast_window
+            return
+
+        if self.set_windows(slow_window, fast_window):
+            return
+
+        # Stored prices don't fill the new slow window, the rest comes from live ticks
+        prices = self.slow_rolling_mean.latest(self.slow_rolling_mean.capacity)
+        self.slow_window = slow_window
+        self.fast_window = fast_window
+        self.reset_windows()
+        self.fill_windows(prices)
 
-            t = threading.Thread(target=learn, daemon=True)
-            t.start()
+    def fill_windows(self, prices: Sequence) -> None:
+        # Prices go to SMAs directly, status is changed once and not on every price
+        for price in prices[-self.slow_rolling_mean.capacity:]:
+            self.slow_rolling_mean.add(price)
+        for price in prices[-self.fast_window:]:
+            self.fast_rolling_mean.add(price)
 
+        if self.status == BotStatus.LOADING and self.slow_rolling_mean.is_full:
+            self.set_running()
+        elif self.status == BotStatus.RUNNING and not self.slow_rolling_mean.is_full:
+            self.set_loading()
+
+    def warm_up(self, history: Sequence) -> None:
+        logging.info(f'Warm up bot={self} from {len(history)} stored prices')
+
+        self.reset_windows()
+        self.fill_windows(history)
+
+    def on_restore(self) -> None:
+        if self.is_learning:
+            self.start()
 
     def step(self, new_price: int) -> None:
         logging.info(f'Step for bot={self}')
@@ -108,28 +225,20 @@ class TrendFollowingBot(BotBase):
     def loading_step(self, new_price: int):
         logging.info(f'Loading step for bot={self}')
 
-        self.loading_prices.append(new_price)
-        
-        if len(self.loading_prices) != self.slow_window:
-            return
-
-        self.slow_window_prices = copy(self.loading_prices)
-        self.fast_window_prices = copy(self.loading_prices[-self.fast_window:])
+        self.slow_rolling_mean.add(new_price)
+        self.fast_rolling_mean.add(new_price)
 
-        self.loading_prices.clear()
-        self.set_running()
+        if self.slow_rolling_mean.is_full:
+            self.set_running()
 
     def running_step(self, new_price):
         logging.info(f'Running step for bot={self}')
 
-        self.slow_window_prices.pop(0)
-        self.fast_window_prices.pop(0)
+        self.slow_rolling_mean.add(new_price)
+        self.fast_rolling_mean.add(new_price)
 
-        self.slow_window_prices.append(new_price)
-        self.fast_window_prices.append(new_price)
-
-        self.slow_sma = np.mean(self.slow_window_prices)
-        self.fast_sma = np.mean(self.fast_window_prices)
+        self.slow_sma = self.slow_rolling_mean.mean
+        self.fast_sma = self.fast_rolling_mean.mean
 
         if not self.invested_in_pair and self.fast_sma > self.slow_sma:
             self.buy(self.quote_asset_balance, new_price)
@@ -140,14 +249,26 @@ class TrendFollowingBot(BotBase):
 
         self.verbose_total_balance(new_price)
 
+    def on_order_result(self, action: BotAction, is_filled: bool) -> None:
+        # Position is taken on submit, so the next ticks don't repeat the order, cancelled order gives it back
+        if not is_filled:
+            self.invested_in_pair = action == BotAction.SELL
+
+    def get_score_data_frame(self, prices: Sequence) -> pa.typing.DataFrame[ScoreDataFrameSchema]:
+        return pd.DataFrame({
+            'Price': prices,
+            'AnyReturn': get_price_returns(prices, self.return_type)
+        })
+
     def score(self, df: pa.typing.DataFrame[ScoreDataFrameSchema], fast: int, slow: int) -> float:
-        self.check_sma_values(fast, slow, len(df))
+        # Reference scoring of one pair of windows, search_parameters scores the whole grid at once
+        self.check_sma_values(slow, fast, len(df))
 
         df['SlowSMA'] = df['Price'].rolling(slow).mean()
         df['FastSMA'] = df['Price'].rolling(fast).mean()
 
         df['Signal'] = np.where(df['FastSMA'] >= df['SlowSMA'], 1, 0)
-        df['AlgoSomeReturn'] = df['Signal'].astype(bool) * df['SomeReturn']
+        df['AlgoSomeReturn'] = df['Signal'].astype(bool) * df['AnyReturn']
 
         if self.return_type == ReturnType.LOG_RETURN:
             return from_log_returns_to_factor(df['AlgoSomeReturn'].values, exponentialize=False)
@@ -162,21 +283,20 @@ class TrendFollowingBot(BotBase):
                           fast_max: int,
                           slow_max: int,
                           fast_slow_min_delta: int) -> MovingWindows:
-        best_fast, best_slow = None, None
-        best_score = float('-inf')
-
-        some_return = get_log_returns(prices) if self.return_type == ReturnType.LOG_RETURN else get_returns(prices)
-        df = pd.DataFrame({
-            'Price': prices,
-            'AnyReturn': some_return
-        })
-
-        for fast in range(fast_min, fast_max):
-            for slow in range(fast + fast_slow_min_delta, slow_max):
-                score = self.score(df, fast, slow)
-                if score > best_score:
-                    best_fast = fast
-                    best_slow = slow
-                    best_score = score
-
-        return MovingWindows(slow_window=best_slow, fast_window=best_fast)
+        def search():
+            if TREND_FOLLOWING_SEARCH_MODE == 'halving':
+                return search_moving_windows_halving(prices, self.return_type, fast_min=fast_min, fast_max=fast_max,
+                                                     slow_max=slow_max, fast_slow_min_delta=fast_slow_min_delta,
+                                                     eta=TREND_FOLLOWING_HALVING_ETA)
+
+            return search_moving_windows(prices, self.return_type, fast_min=fast_min, fast_max=fast_max,
+                                         slow_max=slow_max, fast_slow_min_delta=fast_slow_min_delta)
+
+        # Bots on the same pair with the same prices and bounds share one search
+        key = (self.pair, get_prices_fingerprint(prices), self.return_type, TREND_FOLLOWING_SEARCH_MODE,
+               TREND_FOLLOWING_HALVING_ETA, fast_min, fast_max, slow_max, fast_slow_min_delta)
+        best = search_cache.get_or_compute(key, search)
+        logging.info(f'Best windows for bot={self}: slow={best.slow_window}, fast={best.fast_window}, '
+                     f'score={best.score}')
+
+        return MovingWindows(slow_window=best.slow_window, fast_window=best.fast_window)
@@ -0,0 +1,107 @@
+import hashlib
+import threading
+import time
+import numpy as np
+import requests
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Callable, Hashable, Sequence, Any
+
+from config.settings import DATA_API_URI, SEARCH_CACHE_TTL, SEARCH_CACHE_MAX_SIZE, PRICE_SNAPSHOT_TTL, \
+    PRICE_SNAPSHOT_MAX_SIZE
+
+
+def get_prices_fingerprint(prices: Sequence) -> str:
+    return hashlib.blake2b(np.asarray(prices, dtype=np.float64).tobytes(), digest_size=16).hexdigest()
+
+
+class SearchResultCache:
+    """
+    Results of parameter searches shared by bots, with TTL and LRU eviction above max size.
+
+    Concurrent searches with the same key are computed once, other callers wait for the in-flight one.
+    Failed searches are not cached, every waiter gets the exception.
+    """
+
+    def __init__(self, ttl: float, max_size: int):
+        self.ttl = ttl
+        self.max_size = max_size
+
+        self.lock = threading.Lock()
+        # key -> (expires_at, result), the least recently used first
+        self.results: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self.in_flight: dict[Hashable, Future] = {}
+
+        # Counters
+        self.hits = 0
+        self.misses = 0
+        self.deduplicated = 0
+        self.evicted = 0
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        with self.lock:
+            entry = self.results.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self.results.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+
+            future = self.in_flight.get(key)
+            is_owner = future is None
+            if is_owner:
+                future = self.in_flight[key] = Future()
+                self.misses += 1
+            else:
+                self.deduplicated += 1
+
+        if not is_owner:
+            return future.result()
+
+        try:
+            result = compute()
+        except BaseException as e:
+            with self.lock:
+                del self.in_flight[key]
+            future.set_exception(e)
+            raise
+
+        with self.lock:
+            del self.in_flight[key]
+            self.results[key] = (time.monotonic() + self.ttl, result)
+            self.results.move_to_end(key)
+            while len(self.results) > self.max_size:
+                self.results.popitem(last=False)
+                self.evicted += 1
+
+        future.set_result(result)
+        return result
+
+    def clear(self) -> None:
+        with self.lock:
+            self.results.clear()
+
+    def stats(self) -> dict:
+        return {
+            'size': len(self.results),
+            'in_flight': len(self.in_flight),
+            'hits': self.hits,
+            'misses': self.misses,
+            'deduplicated': self.deduplicated,
+            'evicted': self.evicted
+        }
+
+
+search_cache = SearchResultCache(SEARCH_CACHE_TTL, SEARCH_CACHE_MAX_SIZE)
+price_snapshots = SearchResultCache(PRICE_SNAPSHOT_TTL, PRICE_SNAPSHOT_MAX_SIZE)
+
+
+def get_price_snapshot(pair: str) -> np.ndarray:
+    # Bots of a pair started within the ttl get the same prices, concurrent fetches of a pair are done once
+    def fetch():
+        response = requests.get(f'{DATA_API_URI}/api/get-tick-prices/{pair}')
+        prices = np.asarray(response.json()['prices'], dtype=np.float64)
+        # Snapshot is shared by bots
+        prices.setflags(write=False)
+        return prices
+
+    return price_snapshots.get_or_compute(pair, fetch)
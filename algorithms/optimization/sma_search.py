@@ -0,0 +1,144 @@
+import numpy as np
+from typing import Sequence, NamedTuple
+
+from algorithms.bots.base_enums import ReturnType
+from algorithms.preprocessing.returns import get_log_returns, get_returns
+
+
+# Upper bound of memory taken by one chunk of the (window pairs x prices) grid
+MAX_CHUNK_BYTES = 64 * 1024 * 1024
+
+
+class WindowsScore(NamedTuple):
+    slow_window: int | None
+    fast_window: int | None
+    score: float
+
+
+def get_price_returns(prices: Sequence, return_type: ReturnType) -> np.ndarray:
+    # Return of every price from the previous one, the first price has no return
+    if return_type == ReturnType.LOG_RETURN:
+        returns = get_log_returns(prices, remove_first=False)
+    elif return_type == ReturnType.RETURN:
+        returns = get_returns(prices, remove_first=False)
+    else:
+        raise ValueError(f'Unknown return type: {return_type}')
+
+    return np.nan_to_num(np.asarray(returns, dtype=np.float64), nan=0.)
+
+
+def get_window_pairs(fast_min: int, fast_max: int, slow_max: int, fast_slow_min_delta: int) -> np.ndarray:
+    # (fast, slow) pairs in the order they are scored, fast windows in range(fast_min, fast_max),
+    # slow windows in range(fast + fast_slow_min_delta, slow_max)
+    pairs = [(fast, slow)
+             for fast in range(fast_min, fast_max)
+             for slow in range(fast + fast_slow_min_delta, slow_max)]
+
+    return np.array(pairs, dtype=np.int64).reshape(-1, 2)
+
+
+def get_smas(cumulative_sums: np.ndarray, offset: float, windows: np.ndarray) -> np.ndarray:
+    # Simple moving averages of every window (rows) at every price (columns), NaN until window is filled
+    n = len(cumulative_sums) - 1
+    ends = np.arange(1, n + 1)
+    starts = ends[None, :] - windows[:, None]
+
+    with np.errstate(invalid='ignore'):
+        sums = cumulative_sums[ends][None, :] - cumulative_sums[np.maximum(starts, 0)]
+        smas = sums / windows[:, None] + offset
+    smas[starts < 0] = np.nan
+
+    return smas
+
+
+def score_window_pairs(prices: Sequence, returns: np.ndarray, pairs: np.ndarray, return_type: ReturnType,
+                       max_chunk_bytes: int = MAX_CHUNK_BYTES):
+    """
+    Scores every (fast, slow) pair like TrendFollowingBot.score: invested while fast SMA >= slow SMA,
+    score is the sum of strategy log returns or product of strategy returns.
+
+    Yields (pairs chunk, scores chunk), every SMA is computed from one cumulative sum of prices.
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+
+    # Prices are centered on the first one, so cumulative sums keep precision on long histories
+    offset = prices[0]
+    cumulative_sums = np.concatenate(([0.], np.cumsum(prices - offset)))
+
+    # Every pair in a chunk takes a few (pairs x prices) temporaries: indexes, SMAs, signals and strategy returns
+    chunk_size = max(1, max_chunk_bytes // (8 * 8 * len(prices)))
+    for start in range(0, len(pairs), chunk_size):
+        chunk = pairs[start:start + chunk_size]
+
+        with np.errstate(invalid='ignore'):
+            signals = get_smas(cumulative_sums, offset, chunk[:, 0]) >= get_smas(cumulative_sums, offset, chunk[:, 1])
+        strategy_returns = signals * returns[None, :]
+
+        if return_type == ReturnType.LOG_RETURN:
+            scores = np.sum(strategy_returns, axis=1)
+        else:
+            scores = np.prod(1 + strategy_returns, axis=1)
+
+        yield chunk, scores
+
+
+def get_best_pair(prices: Sequence, returns: np.ndarray, pairs: np.ndarray, return_type: ReturnType,
+                  max_chunk_bytes: int = MAX_CHUNK_BYTES) -> WindowsScore:
+    # The first best pair in order of pairs wins, like in the loop over fast and then slow windows
+    best = WindowsScore(slow_window=None, fast_window=None, score=float('-inf'))
+    for chunk, scores in score_window_pairs(prices, returns, pairs, return_type, max_chunk_bytes):
+        scores = np.where(np.isnan(scores), -np.inf, scores)
+        i = int(np.argmax(scores))
+        if scores[i] > best.score:
+            best = WindowsScore(slow_window=int(chunk[i, 1]), fast_window=int(chunk[i, 0]), score=float(scores[i]))
+
+    return best
+
+
+def search_moving_windows(prices: Sequence, return_type: ReturnType, fast_min: int, fast_max: int, slow_max: int,
+                          fast_slow_min_delta: int, max_chunk_bytes: int = MAX_CHUNK_BYTES) -> WindowsScore:
+    # Exhaustive search: every pair of the grid is scored on the whole history
+    pairs = get_window_pairs(fast_min, fast_max, slow_max, fast_slow_min_delta)
+    # Windows longer than history are never filled
+    pairs = pairs[pairs[:, 1] <= len(prices)]
+    if not len(pairs):
+        return WindowsScore(slow_window=None, fast_window=None, score=float('-inf'))
+
+    return get_best_pair(prices, get_price_returns(prices, return_type), pairs, return_type, max_chunk_bytes)
+
+
+def search_moving_windows_halving(prices: Sequence, return_type: ReturnType, fast_min: int, fast_max: int,
+                                  slow_max: int, fast_slow_min_delta: int, eta: int = 3, rungs: int = 4,
+                                  max_chunk_bytes: int = MAX_CHUNK_BYTES) -> WindowsScore:
+    """
+    Successive halving over the grid: all pairs are scored on a short prefix of history,
+    the best 1 / eta of them go on to a prefix eta times longer, and so on.
+    Only survivors of the last rung are scored on the whole history.
+
+    Falls back to the exhaustive search when history is too short to be split into rungs.
+    """
+    pairs = get_window_pairs(fast_min, fast_max, slow_max, fast_slow_min_delta)
+    pairs = pairs[pairs[:, 1] <= len(prices)]
+    if not len(pairs):
+        return WindowsScore(slow_window=None, fast_window=None, score=float('-inf'))
+
+    # Every prefix should fill the slowest window a few times, short histories are scored whole at once
+    min_prefix_size = 4 * int(pairs[:, 1].max())
+    prefix_size = min(max(min_prefix_size, len(prices) // eta ** rungs, 1), len(prices))
+
+    returns = get_price_returns(prices, return_type)
+    while prefix_size < len(prices) and len(pairs) > 1:
+        scores = np.concatenate([
+            chunk_scores for _, chunk_scores in score_window_pairs(prices[:prefix_size], returns[:prefix_size], pairs,
+                                                                   return_type, max_chunk_bytes)
+        ])
+        scores = np.where(np.isnan(scores), -np.inf, scores)
+
+        # Survivors keep order of the grid, so ties are broken like in the exhaustive search
+        survivors_number = max(1, int(np.ceil(len(pairs) / eta)))
+        survivors = np.sort(np.argsort(-scores, kind='stable')[:survivors_number])
+        pairs = pairs[survivors]
+
+        prefix_size *= eta
+
+    return get_best_pair(prices, returns, pairs, return_type, max_chunk_bytes)
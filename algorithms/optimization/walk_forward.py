@@ -0,0 +1,111 @@
+import numpy as np
+from typing import Sequence
+
+from algorithms.optimization.sma_search import WindowsScore, MAX_CHUNK_BYTES
+
+
+class IncrementalWindowsScorer:
+    """
+    Scores of every (fast, slow) pair on a rolling window of the latest history_size prices,
+    updated only with ticks which entered or left the window since the previous update.
+
+    Score of a pair is the sum of strategy log returns, invested while fast SMA >= slow SMA like in
+    score_window_pairs. Product of strategy returns is exp of the same sum, so both return types
+    rank pairs the same way and share one scorer.
+    Scores are recomputed from scratch every recompute_interval updates, so they don't drift.
+    """
+
+    def __init__(self, pairs: np.ndarray, history_size: int, recompute_interval: int = 100,
+                 max_chunk_bytes: int = MAX_CHUNK_BYTES):
+        if not len(pairs):
+            raise ValueError('Grid of window pairs is empty')
+
+        self.pairs = pairs
+        self.history_size = history_size
+        self.recompute_interval = recompute_interval
+        self.max_chunk_bytes = max_chunk_bytes
+        self.max_slow = int(pairs[:, 1].max())
+
+        # Latest prices: the rolling window and enough prices before it to compute SMAs of ticks leaving it
+        self.buffer_size = history_size + self.max_slow + 1
+        self.prices = np.empty(0, dtype=np.float64)
+        # Number of prices seen, index of the next price
+        self.seen = 0
+
+        self.scores = np.zeros(len(pairs), dtype=np.float64)
+        self.updates_since_recompute = 0
+
+    def get_contributions(self, prices: np.ndarray, first_index: int, ticks: np.ndarray) -> np.ndarray:
+        # Sum of strategy log returns of every pair over ticks (global indexes), prices start at first_index
+        contributions = np.zeros(len(self.pairs), dtype=np.float64)
+        if not len(ticks):
+            return contributions
+
+        local_ticks = ticks - first_index
+        with np.errstate(divide='ignore', invalid='ignore'):
+            returns = np.log(prices[local_ticks] / prices[np.maximum(local_ticks - 1, 0)])
+        returns = np.nan_to_num(returns, nan=0., posinf=0., neginf=0.)
+        # The first price ever seen has no return
+        returns[ticks == 0] = 0.
+
+        offset = prices[0]
+        cumulative_sums = np.concatenate(([0.], np.cumsum(prices - offset)))
+        ends = local_ticks + 1
+
+        chunk_size = max(1, self.max_chunk_bytes // (8 * 8 * len(ticks)))
+        for start in range(0, len(self.pairs), chunk_size):
+            chunk = self.pairs[start:start + chunk_size]
+
+            smas = []
+            for windows in (chunk[:, 0], chunk[:, 1]):
+                starts = ends[None, :] - windows[:, None]
+                sums = cumulative_sums[ends][None, :] - cumulative_sums[np.maximum(starts, 0)]
+                window_smas = sums / windows[:, None] + offset
+                # Windows are not filled yet only at the beginning of history, earlier prices are always kept
+                window_smas[starts < 0] = np.nan
+                smas.append(window_smas)
+
+            with np.errstate(invalid='ignore'):
+                signals = smas[0] >= smas[1]
+            contributions[start:start + len(chunk)] = signals.astype(np.float64) @ returns
+
+        return contributions
+
+    def update(self, new_prices: Sequence) -> None:
+        new_prices = np.asarray(new_prices, dtype=np.float64)
+        if not len(new_prices):
+            return
+
+        prices = np.concatenate((self.prices, new_prices))
+        first_index = self.seen - len(self.prices)
+        old_seen, new_seen = self.seen, self.seen + len(new_prices)
+
+        self.updates_since_recompute += 1
+        if self.updates_since_recompute >= self.recompute_interval:
+            ticks = np.arange(max(0, new_seen - self.history_size), new_seen)
+            self.scores = self.get_contributions(prices, first_index, ticks)
+            self.updates_since_recompute = 0
+        else:
+            # Ticks which both enter and leave the window within one update are skipped
+            window_start = max(0, new_seen - self.history_size)
+            entering = np.arange(max(old_seen, window_start), new_seen)
+            leaving = np.arange(max(0, old_seen - self.history_size), min(old_seen, window_start))
+            self.scores += self.get_contributions(prices, first_index, entering)
+            self.scores -= self.get_contributions(prices, first_index, leaving)
+
+        self.prices = prices[-self.buffer_size:]
+        self.seen = new_seen
+
+    @property
+    def window_size(self) -> int:
+        return min(self.seen, self.history_size)
+
+    def get_best(self) -> WindowsScore:
+        # The first best pair in order of the grid wins, like in the exhaustive search
+        scores = np.where(self.pairs[:, 1] <= self.window_size, self.scores, -np.inf)
+        i = int(np.argmax(scores))
+        if not np.isfinite(scores[i]):
+            return WindowsScore(slow_window=None, fast_window=None, score=float('-inf'))
+
+        return WindowsScore(slow_window=int(self.pairs[i, 1]), fast_window=int(self.pairs[i, 0]),
+                            score=float(scores[i]))
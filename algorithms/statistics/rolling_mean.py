@@ -0,0 +1,92 @@
+from array import array
+from typing import Iterable
+
+
+class RollingMean:
+    """
+    Mean of the latest window values in O(1) per value.
+
+    Values are kept in a preallocated ring buffer, the running sum is compensated (Neumaier)
+    and recomputed exactly every recompute_interval values, so it doesn't drift on long runs.
+    Capacity of the buffer can exceed the window, then the window can be changed in place up to the capacity.
+    """
+
+    __slots__ = ('window', 'capacity', 'recompute_interval', 'values', 'index', 'size', 'total', 'compensation',
+                 'updates_since_recompute')
+
+    def __init__(self, window: int, values: Iterable[float] = (), recompute_interval: int = 1024,
+                 capacity: int = None):
+        capacity = window if capacity is None else capacity
+        if window <= 0 or capacity < window:
+            raise ValueError(f'Window should be greater than zero and not greater than capacity, '
+                             f'but provided window={window}, capacity={capacity}')
+
+        self.window = window
+        self.capacity = capacity
+        self.recompute_interval = recompute_interval
+        self.values = array('d', bytes(8 * capacity))
+        self.index = 0
+        self.size = 0
+        self.total = 0.
+        self.compensation = 0.
+        self.updates_since_recompute = 0
+
+        for value in values:
+            self.add(value)
+
+    def accumulate(self, value: float) -> None:
+        total = self.total + value
+        if abs(self.total) >= abs(value):
+            self.compensation += (self.total - total) + value
+        else:
+            self.compensation += (value - total) + self.total
+        self.total = total
+
+    def add(self, value: float) -> None:
+        if self.size >= self.window:
+            self.accumulate(-self.values[(self.index - self.window) % self.capacity])
+        if self.size < self.capacity:
+            self.size += 1
+
+        self.values[self.index] = value
+        self.accumulate(value)
+        self.index = (self.index + 1) % self.capacity
+
+        self.updates_since_recompute += 1
+        if self.updates_since_recompute >= self.recompute_interval:
+            self.recompute()
+
+    def latest(self, n: int) -> list[float]:
+        # The latest n stored values, the oldest first
+        n = min(n, self.size)
+        return [self.values[(self.index - n + i) % self.capacity] for i in range(n)]
+
+    def recompute(self) -> None:
+        self.total = 0.
+        self.compensation = 0.
+        for value in self.latest(self.window):
+            self.accumulate(value)
+        self.updates_since_recompute = 0
+
+    def set_window(self, window: int) -> None:
+        if window <= 0 or window > self.capacity:
+            raise ValueError(f'Window should be greater than zero and not greater than {self.capacity}, '
+                             f'but provided {window}')
+
+        self.window = window
+        self.recompute()
+
+    @property
+    def count(self) -> int:
+        return min(self.size, self.window)
+
+    @property
+    def is_full(self) -> bool:
+        return self.size >= self.window
+
+    @property
+    def mean(self) -> float | None:
+        if not self.size:
+            return None
+
+        return (self.total + self.compensation) / self.count
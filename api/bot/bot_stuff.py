@@ -41,11 +41,7 @@ async def create_specific_bot(BotParameters: Type[TrendFollowingBotParameters |
     bot_id = await add_bot_to_db(bot_type_name, parameters, db)
     parameters['id'] = bot_id
 
-    # Create bot
-    bot = BotClass(**parameters)
-    bot.start()
-
-    # Adding bot to Pool
-    pool.add(parameters['pair'], bot)
+    # Create bot and add it to Pool, bot is started once by its owner
+    pool.create_bot(parameters['pair'], BotClass, parameters)
 
     return bot_id
@@ -6,6 +6,7 @@ from sqlalchemy.orm.exc import UnmappedInstanceError
 from models.models_ import Bot, BotType, Stock, Key, Kline, Transaction
 from api.bot.request_parameters import BotBaseParameters
 from algorithms.bots.base import BotStatus
+from services.metadata_cache import metadata_cache
 
 
 async def add_bot_to_db(bot_type_name: Literal['trend-following-bot', 'dca-bot', 'grid-bot', 'reinforcement-bot'],
@@ -13,8 +14,8 @@ async def add_bot_to_db(bot_type_name: Literal['trend-following-bot', 'dca-bot',
                         db: Session) -> int:
     logging.info('Add bot to db')
 
-    bot_type_id = db.query(BotType).filter(BotType.name == bot_type_name).first().id
-    stock_id = db.query(Stock).filter(Stock.name == parameters['pair']).first().id
+    bot_type_id = metadata_cache.get_bot_type(bot_type_name, db).id
+    stock_id = metadata_cache.get_stock_id(parameters['pair'], db)
 
     # for dca bot
     investment_interval_scale = None
@@ -44,6 +45,7 @@ async def add_bot_to_db(bot_type_name: Literal['trend-following-bot', 'dca-bot',
 
     db.add(bot)
     db.commit()
+    metadata_cache.set_bot_stock_id(bot.id, stock_id)
 
     return bot.id
 
@@ -51,16 +53,18 @@ async def add_bot_to_db(bot_type_name: Literal['trend-following-bot', 'dca-bot',
 async def add_pair_to_db(stock_name: str, db: Session) -> bool:
     logging.info(f'Try to add pair {stock_name} to db')
 
-    existing_stock = db.query(Stock).filter(Stock.name == stock_name).first()
-    logging.info(f'Existed stock: {existing_stock}')
+    existing_stock_id = metadata_cache.get_stock_id(stock_name, db)
+    logging.info(f'Existed stock id: {existing_stock_id}')
 
-    if existing_stock:
+    if existing_stock_id is not None:
         logging.info(f'Pair {stock_name} already exists in db')
         return False
 
     pair = Stock(name=stock_name)
     db.add(pair)
     db.commit()
+    metadata_cache.invalidate_stock(stock_name)
+    metadata_cache.set_stock(pair.id, stock_name)
 
     logging.info(f'Successfully added pair {stock_name} to db')
     return True
@@ -69,12 +73,12 @@ async def add_pair_to_db(stock_name: str, db: Session) -> bool:
 async def remove_klines_from_db(stock_name: str, db: Session) -> None:
     logging.info(f'Remove klines of pair={stock_name} from db')
 
-    pair = db.query(Stock).filter(Stock.name == stock_name).first()
-    if not pair:
+    pair_id = metadata_cache.get_stock_id(stock_name, db)
+    if pair_id is None:
         logging.info(f'Pair {stock_name} doesn\'t exist in db')
         return
 
-    db.query(Kline).filter(Kline.stock_id == pair.id).delete()
+    db.query(Kline).filter(Kline.stock_id == pair_id).delete()
     db.commit()
 
 
@@ -89,6 +93,7 @@ async def remove_pair_and_klines_from_db(stock_name: str, db: Session) -> None:
     # db.query(Kline).filter(Kline.stock_id == pair.id).delete()
     db.delete(pair)
     db.commit()
+    metadata_cache.invalidate_stock(stock_name)
 
 
 async def remove_transactions_from_db(bot_id: int, db: Session) -> None:
@@ -5,7 +5,7 @@ from sqlalchemy.orm.exc import UnmappedInstanceError
 from sqlalchemy.orm.session import Session
 
 from models.models_ import Bot, BotType, Stock, Key, Kline, Transaction
-from pool.main import Pool, get_pool
+from pool.main import Pool, get_pool, bot_loader
 from algorithms.bots.base import BotStatus
 from algorithms.bots.trend_following import TrendFollowingBot
 from algorithms.bots.dca import DCABot
@@ -18,6 +18,9 @@ from api.bot.request_parameters import (TrendFollowingBotParameters,
 from api.bot.bot_stuff import create_specific_bot
 from api.bot.data_api_stuff import register_pair_on_data_api, unregister_pair_on_data_api
 from api.bot.db_stuff import remove_klines_from_db, remove_pair_and_klines_from_db
+from services.metadata_cache import metadata_cache
+from services.transaction_journal import transaction_journal
+from services.status_writer import bot_status_writer
 
 
 bot_router = APIRouter(prefix='/bot')
@@ -26,14 +29,13 @@ bot_router = APIRouter(prefix='/bot')
 async def get_bot_pair_id_and_name_from_db(bot_id: int, db: Session) -> (int, str):
     logging.info(f'Try to get pair of bot with id={bot_id} from db')
 
-    bot = db.query(Bot).get(bot_id)
-    if not bot:
+    pair_id = metadata_cache.get_bot_stock_id(bot_id, db)
+    if pair_id is None:
         logging.info(f'Bot with id={bot_id} is not found in the db')
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                             detail=f'Bot with id={bot_id} is not found in db.')
 
-    pair_id = bot.stock_id
-    return pair_id, db.query(Stock).filter(Stock.id == pair_id).first().name
+    return pair_id, metadata_cache.get_stock_name(pair_id, db)
 
 
 @bot_router.get('/get-bot-status/{bot_id}')
@@ -43,18 +45,26 @@ async def get_bot_status(bot_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f'Bot with id={bot_id} is not found in db')
 
     return {
-        'bot_status': bot.status,
+        'bot_status': bot_status_writer.get(bot_id) or bot.status,
         'message': f'Bot status for bot with id={bot_id} is successfully obtained'
     }
 
 
+@bot_router.get('/get-loader-progress')
+async def get_loader_progress():
+    return {
+        'loader_progress': bot_loader.progress(),
+        'message': 'Bot loader progress is successfully obtained'
+    }
+
+
 @bot_router.get('/get-bot-parameters-schema/{bot_id}')
 async def get_bot_parameters_schema(bot_id: int, db: Session = Depends(get_db)):
     bot = db.query(Bot).get(bot_id)
     if bot is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f'Bot with id={bot_id} is not found in db')
 
-    bot_type = db.query(BotType).get(bot.bot_type_id)
+    bot_type = metadata_cache.get_bot_type_by_id(bot.bot_type_id, db)
 
     return {
         'bot_parameters_schema': bot_type.parameters_schema,
@@ -64,9 +74,16 @@ async def get_bot_parameters_schema(bot_id: int, db: Session = Depends(get_db)):
 
 @bot_router.get('/get-bot-transactions/{bot_id}')
 async def get_bot_transactions(bot_id: int, db: Session = Depends(get_db)):
-    transactions = db.query(Transaction)\
-        .filter(Transaction.bot_id == bot_id)\
-        .order_by(Transaction.date).all()
+    # Journal can't commit a batch between the two reads
+    with transaction_journal.commit_lock:
+        transactions = db.query(Transaction)\
+            .filter(Transaction.bot_id == bot_id)\
+            .order_by(Transaction.date).all()
+
+        # Transactions which are not written to db yet
+        pending = transaction_journal.pending(bot_id)
+
+    transactions += [Transaction(**row) for row in pending]
 
     return {'transactions': transactions}
 
@@ -81,7 +98,7 @@ async def edit_bot(request: Request, bot_id: int,
 
     bot_db = db.query(Bot).get(bot_id)
     bot_type_id = bot_db.bot_type_id
-    bot_type_name = db.query(BotType).get(bot_type_id).name
+    bot_type_name = metadata_cache.get_bot_type_by_id(bot_type_id, db).name
 
     # Get body
     body = dict(await request.form())
@@ -93,8 +110,7 @@ async def edit_bot(request: Request, bot_id: int,
         raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
 
     # Update bot in the pool
-    bot = pool.get_bot(bot_id)
-    bot.__dict__.update(parsed_body)
+    pool.update_bot(bot_id, parsed_body)
 
     # Update bot in db todo: cannot change pair of bot
     bot_param_field = {}
@@ -153,9 +169,9 @@ async def start_bot(bot_id: int, pool: Pool = Depends(get_pool), db: Session = D
     logging.info(f'Successfully started bot with id={bot_id} in pool')
 
     # Register pair if no other bot is using it
+    bot_status_writer.flush()
     if db.query(Bot).filter(Bot.stock_id == pair_id)\
             .filter(Bot.status != BotStatus.STOPPED).count() == 1:
-        pair = db.query(Stock).filter(Stock.id == pair_id).first().name
         await register_pair_on_data_api(pair)
         logging.info(f'Successfully register pair with id={id} name={pair}')
     else:
@@ -181,9 +197,9 @@ async def stop_bot(bot_id: int, pool: Pool = Depends(get_pool), db: Session = De
     logging.info(f'Successfully stopped bot with id={bot_id} in pool')
 
     # Unregister pair if no bot is using it
+    bot_status_writer.flush()
     if db.query(Bot).filter(Bot.stock_id == pair_id)\
             .filter(Bot.status != BotStatus.STOPPED).count() == 0:
-        pair = db.query(Stock).filter(Stock.id == pair_id).first().name
         await remove_klines_from_db(pair, db)
         await unregister_pair_on_data_api(pair)
         logging.info(f'Successfully unregister pair with id={pair_id} name={pair}')
@@ -208,10 +224,11 @@ async def delete_bot(bot_id: int, pool: Pool = Depends(get_pool), db: Session =
     db.delete(bot)
     db.commit()
     pair_id = bot.stock_id
+    metadata_cache.invalidate_bot(bot_id)
     logging.info(f'Successfully deleted bot with id={bot_id} from db')
 
     # Delete bot from Pool
-    pair = db.query(Stock).filter(Stock.id == pair_id).first().name
+    pair = metadata_cache.get_stock_name(pair_id, db)
     is_deleted = pool.remove(pair, bot_id)
     if not is_deleted:
         logging.info(f'Bot with id={bot_id} is not found in the pool')
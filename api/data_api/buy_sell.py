@@ -3,11 +3,14 @@ import logging
 from fastapi import HTTPException, status
 from sqlalchemy.orm.session import Session
 from datetime import datetime
-from binance import AsyncClient
 from binance.exceptions import BinanceAPIException
 
 from models.models_ import Stock, Kline, Key
-from api.data_api.preprocessing import split_pair, float_to_str
+from exceptions.exchange_exceptions import OrderNotFilledError, SymbolNotTradedError, ExchangeKeyNotFoundError
+from services.exchange_info import exchange_info, SymbolInfo
+from services.metadata_cache import metadata_cache
+from services.binance_clients import binance_clients
+from services.rate_limiter import exchange_rate_limiter, RequestPriority
 
 
 def parse_datetime(time: str) -> datetime:
@@ -33,12 +36,20 @@ def parse_float(num: str) -> float:
 
 
 def get_pair_id(pair_name: str, db: Session) -> int:
-    pair = db.query(Stock).filter(Stock.name == pair_name).first()
-    if pair is None:
+    pair_id = metadata_cache.get_stock_id(pair_name, db)
+    if pair_id is None:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                             detail=f'Pair {pair_name} is not found in db')
 
-    return pair.id
+    return pair_id
+
+
+async def get_symbol_info(pair: str) -> SymbolInfo:
+    symbol_info = await exchange_info.get_symbol(pair)
+    if symbol_info is None:
+        raise SymbolNotTradedError(f'Pair {pair} is not traded on exchange')
+
+    return symbol_info
 
 
 def get_balance(currency: str, account_info) -> float | None:
@@ -49,59 +60,89 @@ def get_balance(currency: str, account_info) -> float | None:
     return None
 
 
-async def buy_pair(pair: str, key_id: int, quote_asset_quantity: float, db: Session):
+def get_filled_amounts(order: dict, commission_asset: str) -> tuple[float, float, float]:
+    # Base asset quantity, commission paid in commission_asset and average price of all fills of the order
+    fills = order['fills']
+    if not fills:
+        raise OrderNotFilledError(f'Order on {order["symbol"]} is not filled')
+
+    quantity = sum(float(fill['qty']) for fill in fills)
+    commission = sum(float(fill['commission']) for fill in fills if fill['commissionAsset'] == commission_asset)
+    price = float(order['cummulativeQuoteQty']) / quantity
+
+    return quantity, commission, price
+
+
+async def buy_pair(pair: str, key_id: int, quote_asset_quantity: float, db: Session,
+                   priority: RequestPriority = RequestPriority.BUY):
     logging.info(f'View sell pair={pair}, quote_asset_quantity={quote_asset_quantity}')
 
-    key = db.query(Key).get(key_id)
+    key = metadata_cache.get_key(key_id, db)
     if not key:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
-                            detail=f'Key with id={key_id} is not found')
-
-    client = await AsyncClient.create(api_key=key.api_key, api_secret=key.secret_key)
+        raise ExchangeKeyNotFoundError(f'Key with id={key_id} is not found')
 
-    base_currency, quote_currency = split_pair(pair)
-    quote_balance = get_balance(quote_currency, await client.get_account())
-    buy_amount = min(quote_balance, quote_asset_quantity)
+    client = await binance_clients.get_client(key)
+    symbol_info = await get_symbol_info(pair)
 
-    order = await client.order_market_buy(symbol=pair, quoteOrderQty=float_to_str(buy_amount))
+    base_currency, quote_currency = symbol_info.base_asset, symbol_info.quote_asset
+    quote_balance = await binance_clients.get_balance(key, quote_currency, priority)
+    buy_amount = symbol_info.format_quote_quantity(min(quote_balance, quote_asset_quantity))
 
-    await client.close_connection()
+    try:
+        order = await exchange_rate_limiter.call('order', client.order_market_buy, key_id=key.id, priority=priority,
+                                                 symbol=pair, quoteOrderQty=buy_amount)
+    except BinanceAPIException:
+        binance_clients.invalidate_balances(key.id)
+        raise
 
-    fills = order['fills'][0]
+    quantity, commission, price = get_filled_amounts(order, base_currency)
+    base_asset_bought = quantity - commission
+    quote_asset_sold = float(order['cummulativeQuoteQty'])
+    binance_clients.apply_fill(key.id, base_currency, quote_currency, base_asset_bought, -quote_asset_sold)
 
     return {
         'message': 'Successfully sell',
-        'base_asset_bought': float(fills['qty']) - float(fills['commission']),
-        'quote_asset_sold': float(order['cummulativeQuoteQty']),
-        'price': float(fills['price'])
+        'base_asset_bought': base_asset_bought,
+        'quote_asset_sold': quote_asset_sold,
+        'price': price
     }
 
 
-async def sell_pair(pair: str, key_id: int, quote_asset_quantity: float, db: Session):
+async def sell_pair(pair: str, key_id: int, quote_asset_quantity: float, db: Session,
+                    priority: RequestPriority = RequestPriority.SELL, price: float = None):
     logging.info(f'View sell pair={pair}, quote_asset_quantity={quote_asset_quantity}')
 
-    key = db.query(Key).get(key_id)
+    key = metadata_cache.get_key(key_id, db)
     if not key:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
-                            detail=f'Key with id={key_id} is not found')
+        raise ExchangeKeyNotFoundError(f'Key with id={key_id} is not found')
+
+    client = await binance_clients.get_client(key)
+    symbol_info = await get_symbol_info(pair)
 
-    client = await AsyncClient.create(api_key=key.api_key, api_secret=key.secret_key)
+    base_currency, quote_currency = symbol_info.base_asset, symbol_info.quote_asset
+    base_balance = await binance_clients.get_balance(key, base_currency, priority)
 
-    base_currency, quote_currency = split_pair(pair)
-    base_balance = get_balance(base_currency, await client.get_account())
+    # Order for more than the balance would be rejected, the whole balance is sold instead
+    if price is not None and quote_asset_quantity / price >= base_balance:
+        quantity = {'quantity': symbol_info.format_quantity(base_balance, price)}
+    else:
+        quantity = {'quoteOrderQty': symbol_info.format_quote_quantity(quote_asset_quantity)}
 
     try:
-        order = await client.order_market_sell(symbol=pair, quoteOrderQty=float_to_str(quote_asset_quantity))
+        order = await exchange_rate_limiter.call('order', client.order_market_sell, key_id=key.id, priority=priority,
+                                                 symbol=pair, **quantity)
     except BinanceAPIException:
-        order = await client.order_market_sell(symbol=pair, quantity=float_to_str(base_balance))
-
-    await client.close_connection()
+        binance_clients.invalidate_balances(key.id)
+        raise
 
-    fills = order['fills'][0]
+    quantity, commission, price = get_filled_amounts(order, quote_currency)
+    base_asset_sold = quantity
+    quote_asset_bought = float(order['cummulativeQuoteQty']) - commission
+    binance_clients.apply_fill(key.id, base_currency, quote_currency, -base_asset_sold, quote_asset_bought)
 
     return {
         'message': 'Successfully sell',
-        'base_asset_sold': float(fills['qty']),
-        'quote_asset_bought': float(order['cummulativeQuoteQty']) - float(fills['commission']),
-        'price': float(fills['price'])
+        'base_asset_sold': base_asset_sold,
+        'quote_asset_bought': quote_asset_bought,
+        'price': price
     }
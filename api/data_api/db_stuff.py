@@ -0,0 +1,22 @@
+import logging
+from typing import Iterable
+from sqlalchemy import insert
+from sqlalchemy.orm.session import Session
+
+from models.models_ import Kline
+from services.metadata_cache import metadata_cache
+
+
+def get_pair_ids(pair_names: Iterable[str], db: Session) -> dict[str, int]:
+    return metadata_cache.get_stock_ids(set(pair_names), db)
+
+
+def add_klines_to_db(klines: list[dict], db: Session) -> None:
+    if not klines:
+        return
+
+    logging.info(f'Bulk insert of {len(klines)} klines')
+
+    # One executemany INSERT for the whole batch
+    db.execute(insert(Kline), klines)
+    db.commit()
@@ -0,0 +1,12 @@
+from datetime import datetime
+from pydantic import BaseModel
+
+
+class TickParameters(BaseModel):
+    pair: str
+    time: datetime
+    open: float
+    close: float
+    high: float
+    low: float
+    vol: float
@@ -0,0 +1,128 @@
+import math
+from datetime import datetime
+from pydantic import parse_obj_as
+from pydantic.error_wrappers import ValidationError
+from sqlalchemy.orm.session import Session
+
+from api.data_api.request_parameters import TickParameters
+from api.data_api.db_stuff import get_pair_ids
+from pool.dispatcher import TickDispatcher
+from services.kline_writer import KlineWriter
+
+
+# Order of fields in a compact tick [pair, time, open, close, high, low, vol]
+COMPACT_TICK_FIELDS = ('pair', 'time', 'open', 'close', 'high', 'low', 'vol')
+
+
+def parse_ticks(raw_ticks: list) -> (list[TickParameters | None], list[dict]):
+    ticks, statuses = [], []
+
+    for raw_tick in raw_ticks:
+        try:
+            ticks.append(parse_obj_as(TickParameters, raw_tick))
+            statuses.append({'status': 'ok'})
+        except ValidationError as e:
+            ticks.append(None)
+            statuses.append({'status': 'error', 'detail': 'Validation error. ' + str(e)})
+
+    return ticks, statuses
+
+
+def parse_compact_tick_time(time: int | float | str) -> datetime:
+    # Epoch milliseconds as sent by the exchange or '%Y-%m-%d %H:%M:%S.%f' string
+    if isinstance(time, bool):
+        raise ValueError(f'Expected time, but get {time}')
+    if isinstance(time, (int, float)):
+        if not math.isfinite(time):
+            raise ValueError(f'Expected finite time, but get {time}')
+        return datetime.fromtimestamp(time / 1000)
+
+    return datetime.fromisoformat(time)
+
+
+def parse_compact_tick_value(value: int | float | str) -> float:
+    # json.loads accepts Infinity and NaN, they are not prices
+    if isinstance(value, bool):
+        raise ValueError(f'Expected number, but get {value}')
+
+    value = float(value)
+    if not math.isfinite(value):
+        raise ValueError(f'Expected finite number, but get {value}')
+
+    return value
+
+
+def parse_compact_ticks(raw_ticks: list) -> (list[TickParameters | None], list[dict]):
+    ticks, statuses = [], []
+
+    for raw_tick in raw_ticks:
+        try:
+            if not isinstance(raw_tick, list) or len(raw_tick) != len(COMPACT_TICK_FIELDS):
+                raise ValueError(f'Expected list of {len(COMPACT_TICK_FIELDS)} values {COMPACT_TICK_FIELDS}')
+
+            pair, time, open, close, high, low, vol = raw_tick
+            if not isinstance(pair, str):
+                raise ValueError(f'Expected pair name, but get {pair}')
+
+            # Values are converted by hand, pydantic validation is too slow for a stream
+            ticks.append(TickParameters.construct(
+                pair=pair, time=parse_compact_tick_time(time), open=parse_compact_tick_value(open),
+                close=parse_compact_tick_value(close), high=parse_compact_tick_value(high),
+                low=parse_compact_tick_value(low), vol=parse_compact_tick_value(vol)
+            ))
+            statuses.append({'status': 'ok'})
+        # Out of range epoch times raise OverflowError or OSError depending on the platform
+        except (ValueError, TypeError, OverflowError, OSError) as e:
+            ticks.append(None)
+            statuses.append({'status': 'error', 'detail': str(e)})
+
+    return ticks, statuses
+
+
+def get_klines(ticks: list[TickParameters | None], statuses: list[dict], pair_ids: dict[str, int]) -> list[dict]:
+    klines = []
+
+    for i, tick in enumerate(ticks):
+        if tick is None:
+            continue
+
+        stock_id = pair_ids.get(tick.pair)
+        if stock_id is None:
+            ticks[i] = None
+            statuses[i] = {'status': 'error', 'detail': f'Pair {tick.pair} is not found in db'}
+            continue
+
+        klines.append({
+            'stock_id': stock_id, 'date': tick.time, 'low': tick.low, 'high': tick.high,
+            'open': tick.open, 'close': tick.close, 'volume': tick.vol
+        })
+
+    return klines
+
+
+def get_latest_closes(ticks: list[TickParameters | None]) -> dict[str, float]:
+    # The latest tick of each pair by time, later ticks in the batch win ties
+    latest = {}
+    for tick in ticks:
+        if tick is None:
+            continue
+
+        current = latest.get(tick.pair)
+        if current is None or tick.time >= current.time:
+            latest[tick.pair] = tick
+
+    return {pair: tick.close for pair, tick in latest.items()}
+
+
+async def ingest_ticks(ticks: list[TickParameters | None], statuses: list[dict],
+                       dispatcher: TickDispatcher, kline_writer: KlineWriter, db: Session) -> int:
+    # Adding all klines to the write-behind buffer, they are flushed to db in bulk
+    pair_ids = get_pair_ids({tick.pair for tick in ticks if tick is not None}, db)
+    klines = get_klines(ticks, statuses, pair_ids)
+    await kline_writer.push_many(klines)
+
+    # Wake up models once per pair with the latest close
+    for pair, close in get_latest_closes(ticks).items():
+        dispatcher.dispatch(pair, close)
+
+    return len(klines)
@@ -1,20 +1,32 @@
+import json
 import logging
 
-from fastapi import APIRouter, Request, Form, Depends, HTTPException, status
+from fastapi import APIRouter, Request, Form, Depends, HTTPException, status, WebSocket, WebSocketDisconnect
 from sqlalchemy.orm.session import Session
 from pydantic import BaseModel
 from datetime import datetime
 from binance import AsyncClient
 from binance.exceptions import BinanceAPIException
 
-from config.settings import get_db
+from config.settings import get_db, SessionLocal, EXCHANGE_MODE
 from models.models_ import Stock, Kline, Key
-from pool.main import Pool, get_pool
+from pool.main import TickDispatcher, get_dispatcher, checkpointer, walk_forward
+from services.kline_writer import KlineWriter, get_kline_writer
+from services.metadata_cache import metadata_cache
+from services.transaction_journal import transaction_journal
+from services.status_writer import bot_status_writer
+from services.order_executor import order_executor
+from services.simulated_exchange import simulated_exchange
+from algorithms.optimization.search_cache import search_cache, price_snapshots
 from api.data_api.preprocessing import split_pair, float_to_str
+from api.data_api.tick_stuff import parse_ticks, parse_compact_ticks, ingest_ticks
 
 
 data_api_router = APIRouter(prefix='/data-api')
 
+# Last acknowledged sequence number of every tick stream, used to resume after reconnect
+stream_last_seqs: dict[str, int] = {}
+
 
 def parse_datetime(time: str) -> datetime:
     parse_str = '%Y-%m-%d %H:%M:%S.%f'
@@ -39,30 +51,139 @@ def parse_float(num: str) -> float:
 
 
 def get_pair_id(pair_name: str, db: Session) -> int:
-    pair = db.query(Stock).filter(Stock.name == pair_name).first()
-    if pair is None:
+    pair_id = metadata_cache.get_stock_id(pair_name, db)
+    if pair_id is None:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                             detail=f'Pair {pair_name} is not found in db')
 
-    return pair.id
+    return pair_id
 
 
 @data_api_router.post("/ticks")
 async def new_ticks(pair: str = Form(...), time: str = Form(...), open: str = Form(...), close: str = Form(...),
                     high: str = Form(...), low: str = Form(...), vol: str = Form(...),
-                    pool: Pool = Depends(get_pool),
+                    dispatcher: TickDispatcher = Depends(get_dispatcher),
+                    kline_writer: KlineWriter = Depends(get_kline_writer),
                     db: Session = Depends(get_db)):
-    # Adding new tick to db
-    kline = Kline(stock_id=get_pair_id(pair, db), date=parse_datetime(time), low=parse_float(low),
-                  high=parse_float(high), open=parse_float(open), close=parse_float(close), volume=parse_float(vol))
+    # Adding new tick to the write-behind buffer
+    kline = dict(stock_id=get_pair_id(pair, db), date=parse_datetime(time), low=parse_float(low),
+                 high=parse_float(high), open=parse_float(open), close=parse_float(close), volume=parse_float(vol))
+
+    await kline_writer.push(kline)
+
+    # Wake up models, bots are run by the pair's mailbox after the response
+    dispatcher.dispatch(pair, parse_float(close))
+
+    return {'message': 'Successfully added new_tick and dispatched bots'}
+
+
+@data_api_router.post("/ticks-batch")
+async def new_ticks_batch(request: Request,
+                          dispatcher: TickDispatcher = Depends(get_dispatcher),
+                          kline_writer: KlineWriter = Depends(get_kline_writer),
+                          db: Session = Depends(get_db)):
+    try:
+        body = await request.json()
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail='Body is not valid json')
+
+    raw_ticks = body.get('ticks') if isinstance(body, dict) else None
+    if not isinstance(raw_ticks, list):
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                            detail='Expected json body with list of ticks under the "ticks" key')
+
+    logging.info(f'View new_ticks_batch | ticks={len(raw_ticks)}')
+
+    # Parse ticks, bad ticks are reported and skipped
+    ticks, statuses = parse_ticks(raw_ticks)
+
+    accepted = await ingest_ticks(ticks, statuses, dispatcher, kline_writer, db)
+
+    return {
+        'statuses': statuses,
+        'message': f'Successfully added {accepted} of {len(raw_ticks)} ticks and dispatched bots'
+    }
+
+
+@data_api_router.websocket("/ticks-stream")
+async def ticks_stream(websocket: WebSocket,
+                       stream_id: str = None,
+                       dispatcher: TickDispatcher = Depends(get_dispatcher),
+                       kline_writer: KlineWriter = Depends(get_kline_writer)):
+    # Frames are {"seq": int, "ticks": [[pair, time, open, close, high, low, vol], ...]},
+    # every frame is acknowledged with {"ack": seq, ...}, malformed frames with {"ack": null, "error": ...}
+    await websocket.accept()
+    logging.info(f'Tick stream connected | stream_id={stream_id}')
+
+    # Tell the client where to resume from
+    last_seq = stream_last_seqs.get(stream_id, 0) if stream_id else 0
+    await websocket.send_json({'last_seq': last_seq})
+
+    try:
+        while True:
+            try:
+                frame = json.loads(await websocket.receive_text())
+            except ValueError as e:
+                await websocket.send_json({'ack': None, 'error': f'Malformed JSON frame: {e}'})
+                continue
+
+            seq = frame.get('seq') if isinstance(frame, dict) else None
+            raw_ticks = frame.get('ticks') if isinstance(frame, dict) else None
+
+            if not isinstance(seq, int) or isinstance(seq, bool) or not isinstance(raw_ticks, list):
+                await websocket.send_json({'ack': seq, 'error': 'Expected frame {"seq": int, "ticks": list}'})
+                continue
+
+            # Frame was already processed before reconnect
+            if seq <= last_seq:
+                await websocket.send_json({'ack': seq, 'duplicate': True})
+                continue
+
+            ticks, statuses = parse_compact_ticks(raw_ticks)
+
+            # Connection lives long, so db session is opened only for the frame
+            db = SessionLocal()
+            try:
+                accepted = await ingest_ticks(ticks, statuses, dispatcher, kline_writer, db)
+            finally:
+                db.close()
+
+            last_seq = seq
+            if stream_id:
+                stream_last_seqs[stream_id] = seq
+
+            await websocket.send_json({
+                'ack': seq,
+                'accepted': accepted,
+                'rejected': [{'index': i, 'detail': tick_status['detail']}
+                             for i, tick_status in enumerate(statuses) if tick_status['status'] != 'ok']
+            })
+    except WebSocketDisconnect:
+        logging.info(f'Tick stream disconnected | stream_id={stream_id}, last_seq={last_seq}')
+
 
-    db.add(kline)
-    db.commit()
+@data_api_router.post("/invalidate-key/{key_id}")
+async def invalidate_key(key_id: int):
+    # Keys are managed outside of this service, it should be called after a key is updated or deleted
+    metadata_cache.invalidate_key(key_id)
+    return {'message': f'Key with id={key_id} is invalidated'}
 
-    # Wake up models
-    pool.run_bots(pair, parse_float(close))
 
-    return {'message': 'Successfully added new_tick and run bots'}
+@data_api_router.get("/metrics")
+async def get_metrics(dispatcher: TickDispatcher = Depends(get_dispatcher),
+                      kline_writer: KlineWriter = Depends(get_kline_writer)):
+    return {
+        'kline_writer': kline_writer.stats(),
+        'dispatcher': dispatcher.stats(),
+        'checkpointer': checkpointer.stats(),
+        'walk_forward': walk_forward.stats(),
+        'transaction_journal': transaction_journal.stats(),
+        'bot_status_writer': bot_status_writer.stats(),
+        'order_executor': order_executor.stats(),
+        'search_cache': search_cache.stats(),
+        'price_snapshots': price_snapshots.stats(),
+        'simulated_exchange': simulated_exchange.stats() if EXCHANGE_MODE == 'simulated' else None
+    }
 
 
 def get_balance(currency: str, account_info) -> float | None:
@@ -0,0 +1,85 @@
+import gc
+import tracemalloc
+import numpy as np
+
+from algorithms.bots.base import BotMoneyMode, ReturnType
+from algorithms.bots.base_enums import InvestmentIntervalScale, RunningMode
+from algorithms.bots.trend_following import TrendFollowingBot
+from algorithms.bots.dca import DCABot
+from algorithms.bots.grid import GridBot
+from algorithms.bots.reinforcement import ReinforcementBot
+from services.status_writer import bot_status_writer
+
+
+HISTORY_SIZE = 1_000
+PAIR = 'BTCUSDT'
+
+# Reinforcement bots train on creation, so fewer of them are created and with fewer episodes
+ReinforcementBot.num_episodes = 5
+
+
+def get_history() -> list[float]:
+    rng = np.random.default_rng(0)
+    return list(30_000 * np.exp(np.cumsum(rng.normal(0, 0.001, HISTORY_SIZE))))
+
+
+def get_common_parameters(bot_id: int) -> dict:
+    return dict(id=bot_id, key_id=1, pair=PAIR, min_level=0., max_level=100_000., max_money_to_invest=1_000.,
+                money_mode=BotMoneyMode.PAPER, return_type=ReturnType.LOG_RETURN)
+
+
+def create_trend_following_bot(bot_id: int, history: list[float]) -> TrendFollowingBot:
+    return TrendFollowingBot(**get_common_parameters(bot_id), slow_window=150, fast_window=30, history=history)
+
+
+def create_dca_bot(bot_id: int, history: list[float]) -> DCABot:
+    return DCABot(**get_common_parameters(bot_id), investment_money=10., investment_interval=1,
+                  investment_interval_scale=InvestmentIntervalScale.DAY, history=history)
+
+
+def create_grid_bot(bot_id: int, history: list[float]) -> GridBot:
+    return GridBot(**get_common_parameters(bot_id), money_to_trade=10., levels_amount=10,
+                   running_mode=RunningMode.STATIC, history=history)
+
+
+def create_reinforcement_bot(bot_id: int, history: list[float]) -> ReinforcementBot:
+    return ReinforcementBot(**get_common_parameters(bot_id), history=history)
+
+
+BOT_FACTORIES = [
+    (create_trend_following_bot, 10_000),
+    (create_dca_bot, 10_000),
+    (create_grid_bot, 10_000),
+    (create_reinforcement_bot, 20)
+]
+
+
+def measure(create_bot, bots_number: int, history: list[float]) -> float:
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+
+    bots = [create_bot(bot_id, history) for bot_id in range(bots_number)]
+
+    # Pending statuses are written to db and released, they are not state of bots
+    with bot_status_writer.lock:
+        bot_status_writer.take_batch()
+    gc.collect()
+
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    del bots
+    return (after - before) / bots_number
+
+
+def main():
+    history = get_history()
+
+    for create_bot, bots_number in BOT_FACTORIES:
+        bytes_per_bot = measure(create_bot, bots_number, history)
+        print(f'{create_bot.__name__}: {bots_number} bots, {bytes_per_bot:,.0f} bytes per bot')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+import time
+import numpy as np
+
+from algorithms.statistics.rolling_mean import RollingMean
+
+
+TICKS_NUMBER = 100_000
+SLOW_WINDOW = 200
+FAST_WINDOW = 50
+
+
+def get_prices() -> list[float]:
+    rng = np.random.default_rng(0)
+    return list(30_000 * np.exp(np.cumsum(rng.normal(0, 0.001, TICKS_NUMBER + SLOW_WINDOW))))
+
+
+def run_lists(prices: list[float]) -> list[float]:
+    # Previous implementation of TrendFollowingBot.running_step
+    slow_window_prices = prices[:SLOW_WINDOW]
+    fast_window_prices = prices[SLOW_WINDOW - FAST_WINDOW:SLOW_WINDOW]
+
+    slow_smas = []
+    for new_price in prices[SLOW_WINDOW:]:
+        slow_window_prices.pop(0)
+        fast_window_prices.pop(0)
+
+        slow_window_prices.append(new_price)
+        fast_window_prices.append(new_price)
+
+        slow_smas.append(np.mean(slow_window_prices))
+        np.mean(fast_window_prices)
+
+    return slow_smas
+
+
+def run_rolling_means(prices: list[float]) -> list[float]:
+    slow_rolling_mean = RollingMean(SLOW_WINDOW, prices[:SLOW_WINDOW])
+    fast_rolling_mean = RollingMean(FAST_WINDOW, prices[SLOW_WINDOW - FAST_WINDOW:SLOW_WINDOW])
+
+    slow_smas = []
+    for new_price in prices[SLOW_WINDOW:]:
+        slow_rolling_mean.add(new_price)
+        fast_rolling_mean.add(new_price)
+
+        slow_smas.append(slow_rolling_mean.mean)
+        fast_rolling_mean.mean
+
+    return slow_smas
+
+
+def main():
+    prices = get_prices()
+
+    results = {}
+    for run in (run_lists, run_rolling_means):
+        start_time = time.perf_counter()
+        results[run.__name__] = run(prices)
+        elapsed = time.perf_counter() - start_time
+        print(f'{run.__name__}: {elapsed:.3f}s, {elapsed / TICKS_NUMBER * 1e6:.2f}us per tick')
+
+    # Running sums should not drift from exact means
+    max_error = np.max(np.abs(np.array(results['run_lists']) - np.array(results['run_rolling_means'])))
+    print(f'Max absolute difference of slow SMAs: {max_error:.3e}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+import time
+import numpy as np
+from functools import wraps
+
+from pool.pool import Pool
+
+
+def timeit(func):
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        start_time = time.perf_counter()
+        result = func(*args, **kwargs)
+        end_time = time.perf_counter()
+
+        print(f'Function {func.__name__}{args}{kwargs} Took {end_time - start_time:.4f} seconds')
+        return result
+    return wrapper
+
+
+BOTS_NUMBER = 100
+TICKS_NUMBER = 5
+SLEEP_TIME = 0.05
+COMPUTATIONS_RANGE = 1000
+PAIR = 'BTCUSDT'
+
+
+class BenchmarkBot:
+    """
+    Imitates a bot step: some computations and blocking I/O (db commit, exchange order)
+    """
+
+    coalesce_ticks = False
+
+    def __init__(self, id: int):
+        self.id = id
+        self.pair = PAIR
+        self.prices = []
+
+    def __repr__(self):
+        return f'Name = {self.__class__.__name__}, id={self.id}'
+
+    def step(self, new_price: float) -> None:
+        x = 2
+        for i in range(COMPUTATIONS_RANGE):
+            x *= np.log2(x)
+        time.sleep(SLEEP_TIME)
+
+        self.prices.append(new_price)
+
+
+@timeit
+def run_ticks(pool: Pool, execution_mode: str, max_concurrency: int):
+    for tick in range(TICKS_NUMBER):
+        pool.run_bots(PAIR, float(tick))
+
+
+def main():
+    pool = Pool()
+    bots = [BenchmarkBot(i) for i in range(BOTS_NUMBER)]
+    pool.add_many(bots)
+
+    for execution_mode, max_concurrency in [('serial', 1), ('threads', 16), ('threads', 64)]:
+        for bot in bots:
+            bot.prices.clear()
+
+        pool.set_execution_mode(execution_mode, max_concurrency)
+        run_ticks(pool, execution_mode, max_concurrency)
+
+        # Every bot should see every tick in order
+        assert all(bot.prices == [float(tick) for tick in range(TICKS_NUMBER)] for bot in bots)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+import time
+
+from algorithms.bots.base import BotBase, BotStatus, BotMoneyMode
+from pool.pool import Pool
+from services.metadata_cache import metadata_cache, KeyInfo
+from services.order_executor import order_executor
+from services.simulated_exchange import SimulatedExchange, use_simulated_exchange
+
+
+BOTS_NUMBER = 1000
+KEYS_NUMBER = 10
+TICKS_NUMBER = 20
+PAIR = 'BTCUSDT'
+
+
+class OrderBot(BotBase):
+    """
+    Real money bot which buys when it holds quote asset and sells when it holds base asset
+    """
+
+    def __init__(self, id: int, key_id: int):
+        super().__init__()
+        self.id = id
+        self.key_id = key_id
+        self.pair = PAIR
+        self.money_mode = BotMoneyMode.REAL
+        self.status = BotStatus.RUNNING
+        self.quote_asset_balance = 1_000
+
+    def start(self, history=None) -> None:
+        pass
+
+    def step(self, new_price: float) -> None:
+        if self.base_asset_balance * new_price > 10:
+            self.sell(self.base_asset_balance * new_price, new_price)
+        elif self.quote_asset_balance > 10:
+            self.buy(min(self.quote_asset_balance, 100), new_price)
+
+
+def run_ticks(pool: Pool, exchange: SimulatedExchange, netting: bool):
+    order_executor.netting = netting
+    submitted, filled, failed = order_executor.submitted, order_executor.filled, order_executor.failed
+
+    start_time = time.perf_counter()
+    for tick in range(TICKS_NUMBER):
+        price = 30_000 * (1 + 0.001 * (tick % 5))
+        exchange.set_price(PAIR, price)
+        pool.run_bots(PAIR, price)
+
+    while order_executor.in_flight():
+        time.sleep(0.01)
+    elapsed = time.perf_counter() - start_time
+
+    intents = order_executor.submitted - submitted
+    print(f'netting={netting}: {intents} intents in {elapsed:.2f}s ({intents / elapsed:.0f} intents/s), '
+          f'filled={order_executor.filled - filled}, failed={order_executor.failed - failed}, '
+          f'exchange={exchange.stats()}, executor={order_executor.stats()}')
+
+
+def main():
+    exchange = SimulatedExchange(latency=0.02, partial_fill_probability=0.1)
+    use_simulated_exchange(exchange)
+    for key_id in range(KEYS_NUMBER):
+        metadata_cache.set_key(KeyInfo(id=key_id, api_key='', secret_key=''))
+
+    pool = Pool('serial')
+    pool.add_many([OrderBot(i, i % KEYS_NUMBER) for i in range(BOTS_NUMBER)])
+
+    order_executor.bot_lock_provider = pool.bot_locks.get
+    order_executor.start()
+    try:
+        for netting in (False, True):
+            run_ticks(pool, exchange, netting)
+    finally:
+        order_executor.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -3,11 +3,72 @@ import logging
 from fastapi import FastAPI
 from api.bot.views import bot_router
 from api.data_api.views import data_api_router
+from services.kline_writer import kline_writer
+from services.transaction_journal import transaction_journal
+from services.status_writer import bot_status_writer
+from services.order_executor import order_executor
+from services.simulated_exchange import simulated_exchange, use_simulated_exchange
+from pool.main import pool, dispatcher, checkpointer, bot_loader, walk_forward
+from config.settings import SessionLocal, POOL_CHECKPOINT_INTERVAL, EXCHANGE_MODE, WALK_FORWARD_INTERVAL
 
 
 app = FastAPI()
 
 
+@app.on_event('startup')
+async def startup():
+    # Real orders are executed offline against prices of received ticks
+    if EXCHANGE_MODE == 'simulated':
+        logging.info('Use simulated exchange')
+        use_simulated_exchange(simulated_exchange)
+        dispatcher.price_listeners.append(simulated_exchange.set_price)
+
+    await kline_writer.start()
+    transaction_journal.start()
+    bot_status_writer.start()
+    order_executor.start()
+
+    # Warm restart from the latest checkpoint
+    if POOL_CHECKPOINT_INTERVAL > 0:
+        checkpointed = checkpointer.load()
+        db = SessionLocal()
+        try:
+            restored = bot_loader.filter_restored(checkpointed, db)
+            restored_ids = {bot.id for _, bot in restored}
+            checkpointer.discard([bot.id for _, bot in checkpointed if bot.id not in restored_ids])
+        except Exception:
+            # Unchecked bots are not restored, their checkpoints are kept for the next start
+            logging.exception('Failed to check checkpointed bots in db')
+            checkpointer.forget([bot.id for _, bot in checkpointed])
+            restored = []
+        finally:
+            db.close()
+
+        pool.restore(restored)
+        if pool.shards is None:
+            checkpointer.start()
+
+    # Load bots which are in db but not in the pool
+    bot_loader.start(pool)
+
+    # Re-optimize windows of trend following bots on the latest prices
+    if WALK_FORWARD_INTERVAL > 0 and pool.shards is None:
+        dispatcher.price_listeners.append(walk_forward.on_price)
+        walk_forward.start()
+
+
+@app.on_event('shutdown')
+async def shutdown():
+    await dispatcher.stop()
+    walk_forward.stop()
+    checkpointer.stop()
+    pool.close()
+    order_executor.stop()
+    transaction_journal.stop()
+    bot_status_writer.stop()
+    await kline_writer.stop()
+
+
 @app.get('/hello')
 async def hello():
     logging.info('hello view')
@@ -23,6 +23,86 @@ API_SECRET = os.getenv('API_SECRET')
 
 DATA_API_URI = os.getenv('DATA_API_URI')
 
+# Write-behind buffer for klines
+KLINE_BUFFER_MAX_SIZE = int(os.getenv('KLINE_BUFFER_MAX_SIZE', 100_000))
+KLINE_FLUSH_BATCH_SIZE = int(os.getenv('KLINE_FLUSH_BATCH_SIZE', 1_000))
+KLINE_FLUSH_INTERVAL = float(os.getenv('KLINE_FLUSH_INTERVAL', 0.5))
+# Retries of a failed batch with exponential backoff from the flush interval, then the batch is dropped
+KLINE_FLUSH_MAX_RETRIES = int(os.getenv('KLINE_FLUSH_MAX_RETRIES', 3))
+
+# Per-pair tick mailboxes
+# When backlog of a pair exceeds the threshold queued ticks are coalesced (0 disables coalescing),
+# mode is 'per-bot-type' (only bots with coalesce_ticks=True get the latest price only) or 'all'.
+# When mailbox is full the oldest tick is dropped (0 means unbounded mailbox).
+TICK_COALESCE_THRESHOLD = int(os.getenv('TICK_COALESCE_THRESHOLD', 10))
+TICK_COALESCE_MODE = os.getenv('TICK_COALESCE_MODE', 'per-bot-type')
+TICK_MAILBOX_MAX_SIZE = int(os.getenv('TICK_MAILBOX_MAX_SIZE', 10_000))
+
+# How Pool steps bots of one pair: 'serial', 'threads' or 'sharded' (pairs are spread across processes)
+POOL_EXECUTION_MODE = os.getenv('POOL_EXECUTION_MODE', 'serial')
+POOL_MAX_CONCURRENCY = int(os.getenv('POOL_MAX_CONCURRENCY', 16))
+POOL_SHARDS_NUMBER = int(os.getenv('POOL_SHARDS_NUMBER', os.cpu_count() or 1))
+# Threads of a shard which warm up new bots, so ticks of its pairs are not stalled by them
+POOL_SHARD_WARM_UP_WORKERS = int(os.getenv('POOL_SHARD_WARM_UP_WORKERS', 2))
+
+# Incremental checkpoints of bots, 0 interval disables them
+POOL_CHECKPOINT_DIR = os.getenv('POOL_CHECKPOINT_DIR', 'checkpoints')
+POOL_CHECKPOINT_INTERVAL = float(os.getenv('POOL_CHECKPOINT_INTERVAL', 30))
+
+# Search of trend following windows: 'exhaustive' or 'halving' (successive halving on history prefixes)
+TREND_FOLLOWING_SEARCH_MODE = os.getenv('TREND_FOLLOWING_SEARCH_MODE', 'halving')
+TREND_FOLLOWING_HALVING_ETA = int(os.getenv('TREND_FOLLOWING_HALVING_ETA', 3))
+# Search results are shared by bots searching on the same prices with the same bounds
+SEARCH_CACHE_TTL = float(os.getenv('SEARCH_CACHE_TTL', 600))
+SEARCH_CACHE_MAX_SIZE = int(os.getenv('SEARCH_CACHE_MAX_SIZE', 1_000))
+# Prices fetched from the data api are shared by bots of a pair, so their searches share the same key
+PRICE_SNAPSHOT_TTL = float(os.getenv('PRICE_SNAPSHOT_TTL', 600))
+PRICE_SNAPSHOT_MAX_SIZE = int(os.getenv('PRICE_SNAPSHOT_MAX_SIZE', 100))
+
+# Seconds unknown pairs are remembered as absent by the metadata cache
+METADATA_CACHE_MISSING_TTL = float(os.getenv('METADATA_CACHE_MISSING_TTL', 5))
+# Walk-forward re-optimization of windows of running trend following bots on the latest prices,
+# 0 interval disables it
+WALK_FORWARD_INTERVAL = float(os.getenv('WALK_FORWARD_INTERVAL', 0))
+WALK_FORWARD_HISTORY_SIZE = int(os.getenv('WALK_FORWARD_HISTORY_SIZE', 5_000))
+
+# Rehydration of bots from db at startup
+BOT_LOADER_WORKERS = int(os.getenv('BOT_LOADER_WORKERS', 8))
+BOT_LOADER_HISTORY_SIZE = int(os.getenv('BOT_LOADER_HISTORY_SIZE', 10_000))
+
+# Batched journal of bot transactions
+TRANSACTION_JOURNAL_BATCH_SIZE = int(os.getenv('TRANSACTION_JOURNAL_BATCH_SIZE', 500))
+TRANSACTION_JOURNAL_FLUSH_INTERVAL = float(os.getenv('TRANSACTION_JOURNAL_FLUSH_INTERVAL', 1.0))
+
+# Coalesced bot status updates
+BOT_STATUS_BATCH_SIZE = int(os.getenv('BOT_STATUS_BATCH_SIZE', 1_000))
+BOT_STATUS_FLUSH_INTERVAL = float(os.getenv('BOT_STATUS_FLUSH_INTERVAL', 0.5))
+
+# Real money orders
+ORDER_EXECUTOR_MAX_CONCURRENCY = int(os.getenv('ORDER_EXECUTOR_MAX_CONCURRENCY', 32))
+BALANCE_REFRESH_INTERVAL = float(os.getenv('BALANCE_REFRESH_INTERVAL', 60))
+# Aggregate orders of bots sharing a pair and a key within one tick into one net order (0 or 1)
+ORDER_NETTING_ENABLED = bool(int(os.getenv('ORDER_NETTING_ENABLED', 0)))
+
+# Exchange rate limits (Binance defaults), a request waits in the queue for at most EXCHANGE_QUEUE_TIMEOUT seconds
+EXCHANGE_REQUEST_WEIGHT_PER_MINUTE = int(os.getenv('EXCHANGE_REQUEST_WEIGHT_PER_MINUTE', 6_000))
+EXCHANGE_ORDERS_PER_10_SECONDS = int(os.getenv('EXCHANGE_ORDERS_PER_10_SECONDS', 50))
+EXCHANGE_ORDERS_PER_DAY = int(os.getenv('EXCHANGE_ORDERS_PER_DAY', 160_000))
+EXCHANGE_QUEUE_TIMEOUT = float(os.getenv('EXCHANGE_QUEUE_TIMEOUT', 10))
+
+# Cached symbol filters of the exchange are refreshed every interval (seconds)
+EXCHANGE_INFO_REFRESH_INTERVAL = float(os.getenv('EXCHANGE_INFO_REFRESH_INTERVAL', 3_600))
+
+# 'binance' or 'simulated' (in-process exchange for paper trading of real orders and load tests)
+EXCHANGE_MODE = os.getenv('EXCHANGE_MODE', 'binance')
+SIMULATED_EXCHANGE_LATENCY = float(os.getenv('SIMULATED_EXCHANGE_LATENCY', 0.05))
+SIMULATED_EXCHANGE_FEE = float(os.getenv('SIMULATED_EXCHANGE_FEE', 0.001))
+SIMULATED_EXCHANGE_PARTIAL_FILL_PROBABILITY = float(os.getenv('SIMULATED_EXCHANGE_PARTIAL_FILL_PROBABILITY', 0))
+SIMULATED_EXCHANGE_BOOK_DEPTH = int(os.getenv('SIMULATED_EXCHANGE_BOOK_DEPTH', 20))
+# Seconds for taken liquidity of a book level to be fully replenished
+SIMULATED_EXCHANGE_REPLENISH_TIME = float(os.getenv('SIMULATED_EXCHANGE_REPLENISH_TIME', 1))
+SIMULATED_EXCHANGE_INITIAL_BALANCE = float(os.getenv('SIMULATED_EXCHANGE_INITIAL_BALANCE', 1_000_000))
+
 
 # Create an engine
 engine = create_engine(DATABASE_URI)
@@ -0,0 +1,23 @@
+class RateLimitTimeoutError(Exception):
+    def __init__(self, message):
+        super().__init__(message)
+
+
+class OrderFilterError(Exception):
+    def __init__(self, message):
+        super().__init__(message)
+
+
+class OrderNotFilledError(Exception):
+    def __init__(self, message):
+        super().__init__(message)
+
+
+class SymbolNotTradedError(Exception):
+    def __init__(self, message):
+        super().__init__(message)
+
+
+class ExchangeKeyNotFoundError(Exception):
+    def __init__(self, message):
+        super().__init__(message)
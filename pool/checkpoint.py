@@ -0,0 +1,174 @@
+import hashlib
+import logging
+import os
+import pickle
+import threading
+import time
+import zlib
+from _thread import LockType
+from typing import Callable, Iterable, Optional
+
+from algorithms.bots.base import BotBase
+
+
+class PoolCheckpointer:
+    """
+    Incremental on-disk checkpoints of bots.
+
+    Every bot is pickled into its own compressed file <bot_id>.ckpt together with its pair.
+    A file is rewritten only when the bot state has changed since the last checkpoint,
+    files of bots which are gone are removed.
+    """
+
+    suffix = '.ckpt'
+
+    def __init__(self,
+                 get_bots: Callable[[], Iterable[tuple[str, BotBase, Optional[LockType]]]],
+                 directory: str,
+                 interval: float):
+        self.get_bots = get_bots
+        self.directory = directory
+        self.interval = interval
+
+        # bot_id -> digest of the last written checkpoint
+        self.digests: dict[int, bytes] = {}
+        self.last_checkpoint_time = time.monotonic()
+
+        self.thread = None
+        self.stop_event = threading.Event()
+
+        # Counters
+        self.checkpoints = 0
+        self.written = 0
+        self.last_checkpoint_duration = 0.
+
+    def get_path(self, bot_id: int) -> str:
+        return os.path.join(self.directory, f'{bot_id}{self.suffix}')
+
+    def write(self, bot_id: int, data: bytes) -> None:
+        # Write to temporary file and rename it, so a crash never leaves half-written checkpoint
+        path = self.get_path(bot_id)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    def checkpoint(self) -> int:
+        start_time = time.perf_counter()
+        os.makedirs(self.directory, exist_ok=True)
+
+        written = 0
+        present = set()
+        for pair, bot, lock in self.get_bots():
+            present.add(bot.id)
+
+            try:
+                if lock is None:
+                    data = pickle.dumps((pair, bot), protocol=pickle.HIGHEST_PROTOCOL)
+                else:
+                    with lock:
+                        data = pickle.dumps((pair, bot), protocol=pickle.HIGHEST_PROTOCOL)
+            except Exception:
+                logging.exception(f'Failed to pickle bot={bot} for checkpoint')
+                continue
+
+            # Skip bots which have not changed
+            digest = hashlib.blake2b(data, digest_size=16).digest()
+            if self.digests.get(bot.id) == digest:
+                continue
+
+            self.write(bot.id, zlib.compress(data, 1))
+            self.digests[bot.id] = digest
+            written += 1
+
+        # Remove checkpoints of bots which are gone
+        self.discard([bot_id for bot_id in self.digests if bot_id not in present])
+
+        self.last_checkpoint_time = time.monotonic()
+        self.last_checkpoint_duration = time.perf_counter() - start_time
+        self.checkpoints += 1
+        self.written += written
+
+        logging.info(f'Checkpoint is done | bots={len(present)}, written={written}, '
+                     f'duration={self.last_checkpoint_duration:.3f}s')
+        return written
+
+    def maybe_checkpoint(self) -> None:
+        # For owners without background thread (shard processes)
+        if self.interval > 0 and time.monotonic() - self.last_checkpoint_time >= self.interval:
+            self.checkpoint()
+
+    def forget(self, bot_ids: Iterable[int]) -> None:
+        # Bots moved to another owner, their files should not be removed by this checkpointer
+        for bot_id in bot_ids:
+            self.digests.pop(bot_id, None)
+
+    def discard(self, bot_ids: Iterable[int]) -> None:
+        for bot_id in bot_ids:
+            self.digests.pop(bot_id, None)
+            try:
+                os.remove(self.get_path(bot_id))
+            except FileNotFoundError:
+                pass
+
+    def load(self) -> list[tuple[str, BotBase]]:
+        if not os.path.isdir(self.directory):
+            return []
+
+        bots = []
+        for file_name in os.listdir(self.directory):
+            if not file_name.endswith(self.suffix):
+                continue
+
+            path = os.path.join(self.directory, file_name)
+            try:
+                with open(path, 'rb') as f:
+                    data = zlib.decompress(f.read())
+                pair, bot = pickle.loads(data)
+            except Exception:
+                logging.exception(f'Failed to load checkpoint {path}')
+                continue
+
+            self.digests[bot.id] = hashlib.blake2b(data, digest_size=16).digest()
+            bots.append((pair, bot))
+
+        logging.info(f'Loaded {len(bots)} bots from checkpoints in {self.directory}')
+        return bots
+
+    def run(self) -> None:
+        while not self.stop_event.wait(self.interval):
+            try:
+                self.checkpoint()
+            except Exception:
+                logging.exception('Checkpoint failed')
+
+    def start(self) -> None:
+        if self.interval <= 0 or self.thread is not None:
+            return
+
+        logging.info(f'Start PoolCheckpointer | directory={self.directory}, interval={self.interval}')
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.run, name='pool-checkpointer', daemon=True)
+        self.thread.start()
+
+    def stop(self) -> None:
+        if self.thread is None:
+            return
+
+        logging.info('Stop PoolCheckpointer')
+        self.stop_event.set()
+        self.thread.join()
+        self.thread = None
+
+        # Final checkpoint on graceful shutdown
+        self.checkpoint()
+
+    def stats(self) -> dict:
+        return {
+            'bots': len(self.digests),
+            'checkpoints': self.checkpoints,
+            'written': self.written,
+            'last_checkpoint_duration': self.last_checkpoint_duration
+        }
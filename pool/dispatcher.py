@@ -0,0 +1,132 @@
+import asyncio
+import logging
+import time
+from typing import Callable
+
+from config.settings import TICK_COALESCE_THRESHOLD, TICK_COALESCE_MODE, TICK_MAILBOX_MAX_SIZE
+from pool.pool import Pool
+
+
+class Mailbox:
+    def __init__(self, pair: str, max_size: int):
+        self.pair = pair
+        self.queue = asyncio.Queue(maxsize=max_size)
+        self.task = None
+
+        self.processed = 0
+        # Bot steps skipped by coalescing, bots which consume every tick skip nothing
+        self.coalesced = 0
+        self.dropped = 0
+        # Lag of the oldest tick of every batch, from dispatch until the pool returns. In sharded mode
+        # the pool returns once ticks are sent to the shard, so lag doesn't include stepping of bots
+        self.batches = 0
+        self.last_lag = 0.
+        self.max_lag = 0.
+        self.total_lag = 0.
+
+    def stats(self) -> dict:
+        return {
+            'depth': self.queue.qsize(),
+            'processed': self.processed,
+            'coalesced': self.coalesced,
+            'dropped': self.dropped,
+            'batches': self.batches,
+            'last_lag': self.last_lag,
+            'max_lag': self.max_lag,
+            'avg_lag': self.total_lag / self.batches if self.batches else 0.
+        }
+
+
+class TickDispatcher:
+    """
+    Owns one ordered mailbox per pair.
+
+    Ticks of a pair are processed strictly in order by the pair's own task, different pairs run concurrently.
+    Bots are stepped in a worker thread, so slow bots never block the event loop.
+
+    When a pair falls behind by more than coalesce_threshold ticks, the whole backlog is passed to the pool
+    at once and bots which allow it get only the latest price. When mailbox is full the oldest tick is dropped.
+    In sharded mode ticks are processed asynchronously by shards, so lag measures only handing them over.
+    """
+
+    def __init__(self, pool: Pool,
+                 coalesce_threshold: int = TICK_COALESCE_THRESHOLD,
+                 coalesce_mode: str = TICK_COALESCE_MODE,
+                 mailbox_max_size: int = TICK_MAILBOX_MAX_SIZE):
+        if coalesce_mode not in ('per-bot-type', 'all'):
+            raise ValueError(f'Unknown coalesce mode: {coalesce_mode}')
+
+        self.pool = pool
+        self.coalesce_threshold = coalesce_threshold
+        self.coalesce_all = coalesce_mode == 'all'
+        self.mailbox_max_size = mailbox_max_size
+        self.mailboxes: dict[str, Mailbox] = {}
+
+        # Called with (pair, price) of every received tick, e.g. to move prices of the simulated exchange
+        self.price_listeners: list[Callable[[str, float], None]] = []
+
+    def dispatch(self, pair: str, new_price: float) -> None:
+        for price_listener in self.price_listeners:
+            price_listener(pair, new_price)
+
+        mailbox = self.mailboxes.get(pair)
+        if mailbox is None:
+            logging.info(f'TickDispatcher | new mailbox for pair={pair}')
+            mailbox = self.mailboxes[pair] = Mailbox(pair, self.mailbox_max_size)
+
+        if mailbox.task is None:
+            mailbox.task = asyncio.create_task(self.run_mailbox(mailbox))
+
+        # Shed load by dropping the oldest tick
+        if mailbox.queue.full():
+            mailbox.queue.get_nowait()
+            mailbox.queue.task_done()
+            mailbox.dropped += 1
+
+        mailbox.queue.put_nowait((time.monotonic(), new_price))
+
+    async def run_mailbox(self, mailbox: Mailbox) -> None:
+        while True:
+            enqueued_at, new_price = await mailbox.queue.get()
+            new_prices = [new_price]
+
+            # Take the whole backlog if the pair falls behind
+            if self.coalesce_threshold and mailbox.queue.qsize() >= self.coalesce_threshold:
+                while not mailbox.queue.empty():
+                    new_prices.append(mailbox.queue.get_nowait()[1])
+
+            try:
+                if len(new_prices) == 1:
+                    await asyncio.to_thread(self.pool.run_bots, mailbox.pair, new_price)
+                else:
+                    logging.info(f'TickDispatcher | coalesce {len(new_prices)} ticks on pair={mailbox.pair}')
+                    mailbox.coalesced += await asyncio.to_thread(self.pool.run_bots_coalesced, mailbox.pair,
+                                                                 new_prices, self.coalesce_all)
+            except Exception:
+                logging.exception(f'TickDispatcher | failed to run bots on pair={mailbox.pair}')
+            finally:
+                for _ in new_prices:
+                    mailbox.queue.task_done()
+
+            lag = time.monotonic() - enqueued_at
+            mailbox.processed += len(new_prices)
+            mailbox.batches += 1
+            mailbox.last_lag = lag
+            mailbox.max_lag = max(mailbox.max_lag, lag)
+            mailbox.total_lag += lag
+
+    async def stop(self) -> None:
+        logging.info('Stop TickDispatcher')
+
+        # Process everything already dispatched
+        for mailbox in list(self.mailboxes.values()):
+            if mailbox.task is not None:
+                await mailbox.queue.join()
+
+        for mailbox in self.mailboxes.values():
+            if mailbox.task is not None:
+                mailbox.task.cancel()
+                mailbox.task = None
+
+    def stats(self) -> dict:
+        return {pair: mailbox.stats() for pair, mailbox in self.mailboxes.items()}
@@ -0,0 +1,170 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from sqlalchemy import func
+from sqlalchemy.orm.session import Session
+
+from config.settings import SessionLocal, BOT_LOADER_WORKERS, BOT_LOADER_HISTORY_SIZE
+from models.models_ import Bot, BotType, Stock, Kline
+from algorithms.bots.base import BotBase, BotStatus
+from algorithms.bots.trend_following import TrendFollowingBot
+from algorithms.bots.dca import DCABot
+from algorithms.bots.grid import GridBot
+from algorithms.bots.reinforcement import ReinforcementBot
+from pool.pool import Pool
+
+
+bot_type_bot_class_mapping = {
+    'trend-following-bot': TrendFollowingBot,
+    'dca-bot': DCABot,
+    'grid-bot': GridBot,
+    'reinforcement-bot': ReinforcementBot
+}
+
+
+def get_bot_parameters(bot: Bot, pair: str) -> dict:
+    parameters = dict(
+        id=bot.id,
+        key_id=bot.key_id,
+        pair=pair,
+        min_level=float(bot.min_level),
+        max_level=float(bot.max_level),
+        max_money_to_invest=float(bot.max_money_to_invest),
+        money_mode=bot.money_mode,
+        return_type=bot.return_type,
+        **(bot.parameters or {})
+    )
+
+    # for dca and grid bots
+    if bot.investment_interval_scale is not None:
+        parameters['investment_interval_scale'] = bot.investment_interval_scale
+    if bot.running_mode is not None:
+        parameters['running_mode'] = bot.running_mode
+
+    return parameters
+
+
+def get_histories(stock_ids: set[int], history_size: int, db: Session) -> dict[int, list[float]]:
+    if not stock_ids or history_size <= 0:
+        return {}
+
+    # The latest history_size closes of every stock in one query
+    row_number = func.row_number().over(partition_by=Kline.stock_id, order_by=Kline.date.desc()).label('row_number')
+    klines = db.query(Kline.stock_id, Kline.date, Kline.close, row_number)\
+        .filter(Kline.stock_id.in_(stock_ids)).subquery()
+    rows = db.query(klines.c.stock_id, klines.c.close)\
+        .filter(klines.c.row_number <= history_size)\
+        .order_by(klines.c.stock_id, klines.c.date).all()
+
+    histories = {}
+    for stock_id, close in rows:
+        histories.setdefault(stock_id, []).append(float(close))
+
+    return histories
+
+
+class BotLoader:
+    """
+    Rehydrates the pool from the Bots table: all not stopped bots are instantiated in bulk
+    and warmed up from stored klines by a pool of workers.
+    """
+
+    def __init__(self, workers: int = BOT_LOADER_WORKERS, history_size: int = BOT_LOADER_HISTORY_SIZE):
+        self.workers = workers
+        self.history_size = history_size
+        self.thread = None
+
+        # Progress
+        self.total = 0
+        self.loaded = 0
+        self.failed = 0
+        self.skipped = 0
+        self.started_at = None
+        self.finished_at = None
+
+    def create_bot(self, pool: Pool, pair: str, bot_type_name: str, parameters: dict,
+                   history: list[float] | None) -> BotBase:
+        BotClass = bot_type_bot_class_mapping[bot_type_name]
+
+        # Without enough stored prices bot loads history from data-api itself
+        if history is None or len(history) < 2:
+            history = None
+
+        return pool.create_bot(pair, BotClass, parameters, history)
+
+    def filter_restored(self, bots: list[tuple[str, BotBase]], db: Session) -> list[tuple[str, BotBase]]:
+        # Bots deleted or stopped after the latest checkpoint should not come back
+        bot_ids = [bot.id for _, bot in bots]
+        active_ids = {bot_id for bot_id, in db.query(Bot.id)
+                      .filter(Bot.id.in_(bot_ids), Bot.status != BotStatus.STOPPED).all()} if bot_ids else set()
+
+        restored = [(pair, bot) for pair, bot in bots if bot.id in active_ids]
+        logging.info(f'BotLoader | {len(restored)} of {len(bots)} checkpointed bots are not stopped in db')
+        return restored
+
+    def load(self, pool: Pool, db: Session) -> int:
+        self.started_at = time.time()
+        self.finished_at = None
+        self.loaded = self.failed = self.skipped = 0
+
+        rows = db.query(Bot, BotType.name, Stock.name)\
+            .join(BotType, Bot.bot_type_id == BotType.id)\
+            .join(Stock, Bot.stock_id == Stock.id)\
+            .filter(Bot.status != BotStatus.STOPPED).all()
+        self.total = len(rows)
+        logging.info(f'BotLoader | {self.total} not stopped bots in db')
+
+        # Bots restored from checkpoints are already in the pool
+        rows = [row for row in rows if pool.get_bot(row[0].id) is None]
+        self.skipped = self.total - len(rows)
+
+        histories = get_histories({bot.stock_id for bot, _, _ in rows}, self.history_size, db)
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='bot-loader') as executor:
+            futures = {
+                executor.submit(self.create_bot, pool, pair, bot_type_name, get_bot_parameters(bot, pair),
+                                histories.get(bot.stock_id)): (bot.id, pair)
+                for bot, bot_type_name, pair in rows
+            }
+
+            for future in as_completed(futures):
+                bot_id, pair = futures[future]
+                try:
+                    future.result()
+                    self.loaded += 1
+                except Exception:
+                    logging.exception(f'BotLoader | failed to load bot with id={bot_id}')
+                    self.failed += 1
+
+        self.finished_at = time.time()
+        logging.info(f'BotLoader | loaded={self.loaded}, failed={self.failed}, skipped={self.skipped} '
+                     f'in {self.finished_at - self.started_at:.2f}s')
+        return self.loaded
+
+    def start(self, pool: Pool) -> None:
+        if self.thread is not None and self.thread.is_alive():
+            return
+
+        def run():
+            db = SessionLocal()
+            try:
+                self.load(pool, db)
+            except Exception:
+                logging.exception('BotLoader | loading failed')
+            finally:
+                db.close()
+
+        self.thread = threading.Thread(target=run, name='bot-loader', daemon=True)
+        self.thread.start()
+
+    def progress(self) -> dict:
+        return {
+            'total': self.total,
+            'loaded': self.loaded,
+            'failed': self.failed,
+            'skipped': self.skipped,
+            'is_running': self.thread is not None and self.thread.is_alive(),
+            'started_at': self.started_at,
+            'finished_at': self.finished_at
+        }
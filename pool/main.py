@@ -1,9 +1,27 @@
 from pool.pool import Pool
+from pool.dispatcher import TickDispatcher
+from pool.checkpoint import PoolCheckpointer
+from pool.loader import BotLoader
+from pool.walk_forward import WalkForwardOptimizer
+from config.settings import POOL_CHECKPOINT_DIR, POOL_CHECKPOINT_INTERVAL, WALK_FORWARD_INTERVAL, \
+    WALK_FORWARD_HISTORY_SIZE
+from services.order_executor import order_executor
 from typing import Generator
 
 
 pool = Pool()
+dispatcher = TickDispatcher(pool)
+checkpointer = PoolCheckpointer(pool.get_checkpoint_bots, POOL_CHECKPOINT_DIR, POOL_CHECKPOINT_INTERVAL)
+bot_loader = BotLoader()
+walk_forward = WalkForwardOptimizer(pool, WALK_FORWARD_INTERVAL, WALK_FORWARD_HISTORY_SIZE)
+
+# Fills are applied to bots under the same lock bots are stepped with
+order_executor.bot_lock_provider = pool.bot_locks.get
 
 
 def get_pool() -> Generator:
     yield pool
+
+
+def get_dispatcher() -> Generator:
+    yield dispatcher
@@ -1,12 +1,17 @@
 import logging
+import threading
+from _thread import LockType
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Iterable, Sequence, Type
 
+from config.settings import POOL_EXECUTION_MODE, POOL_MAX_CONCURRENCY, POOL_SHARDS_NUMBER
 from exceptions.pool_exceptions import PoolExistsError
 from algorithms.bots.base import BotBase
 from algorithms.bots.trend_following import TrendFollowingBot
+from services.order_executor import order_executor
+from pool.sharding import ShardedExecutor, SHARED_STATE_FIELDS
 
 
-# TODO: WHAT happens if server had gone down, and how to restore it
-# also restore if bot is in db but is not in pool
 class Pool:
     is_created = False
 
@@ -17,83 +22,265 @@ class Pool:
         cls.is_created = True
         return super().__new__(cls)
 
-    def __init__(self):
-        self.stock_bots_mapping = {}
+    execution_modes = ('serial', 'threads', 'sharded')
 
-    def add(self, stock_name: str, bot: BotBase):
-        try:
-            self.stock_bots_mapping[stock_name].append(bot)
-            logging.info('bot appended to pool')
-        except KeyError:
-            logging.info('try to add new bot pool')
-            self.stock_bots_mapping[stock_name] = [bot]
-            logging.info('new bot added to pool')
+    def __init__(self, execution_mode: str = POOL_EXECUTION_MODE, max_concurrency: int = POOL_MAX_CONCURRENCY):
+        # pair -> {bot_id: bot}, dicts keep insertion order of bots
+        self.stock_bots_mapping: dict[str, dict[int, BotBase]] = {}
 
-        logging.info(f"Successfully added new stock to pool. Pool={self.stock_bots_mapping}")
+        # bot_id -> bot and bot_id -> pair indexes
+        self.bots: dict[int, BotBase] = {}
+        self.bot_pairs: dict[int, str] = {}
+
+        # A bot is never stepped by two threads at once
+        self.bot_locks: dict[int, LockType] = {}
+
+        self.lock = threading.RLock()
+
+        self.execution_mode = None
+        self.max_concurrency = None
+        self.executor = None
+        # In sharded mode bots live in shard processes and pool keeps their mirrors
+        self.shards = None
+        self.set_execution_mode(execution_mode, max_concurrency)
+
+    def set_execution_mode(self, execution_mode: str, max_concurrency: int = POOL_MAX_CONCURRENCY):
+        if execution_mode not in self.execution_modes:
+            raise ValueError(f'Unknown execution mode: {execution_mode}. Should be one of {self.execution_modes}')
+        if max_concurrency <= 0:
+            raise ValueError(f'Max concurrency should be greater than zero, but provided {max_concurrency}')
+
+        logging.info(f'Pool.set_execution_mode(mode={execution_mode}, max_concurrency={max_concurrency})')
+
+        self.close()
+
+        self.execution_mode = execution_mode
+        self.max_concurrency = max_concurrency
+        self.executor = None if execution_mode in ('serial', 'sharded') \
+            else ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix='pool')
+
+        if execution_mode == 'sharded':
+            self.shards = ShardedExecutor(POOL_SHARDS_NUMBER, self.apply_states)
+            with self.lock:
+                for bot_id, bot in self.bots.items():
+                    self.shards.add_bot(self.bot_pairs[bot_id], bot)
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+            self.executor = None
+
+        if self.shards is not None:
+            self.shards.stop()
+            self.shards = None
+
+    def apply_states(self, states: list[tuple[int, tuple]]):
+        # Refresh mirrors with states sent by shards
+        for bot_id, state in states:
+            bot = self.bots.get(bot_id)
+            if bot is None:
+                continue
+
+            for field, value in zip(SHARED_STATE_FIELDS, state):
+                setattr(bot, field, value)
+
+    def create_bot(self, stock_name: str, BotClass: Type[BotBase], parameters: dict,
+                   history: Sequence = None) -> BotBase:
+        # In sharded mode bot is started only by its shard, so warm up and learning are not run twice
+        is_sharded = self.shards is not None
+        bot = BotClass(**parameters, history=history, autostart=not is_sharded)
+        self.add(stock_name, bot, start_history=history if is_sharded else None, is_started=not is_sharded)
+        return bot
+
+    def add(self, stock_name: str, bot: BotBase, start_history: Sequence = None, is_started: bool = True):
+        with self.lock:
+            # Relocate bot if it is already in the pool
+            if bot.id in self.bots:
+                self.remove(self.bot_pairs[bot.id], bot.id)
+
+            bots = self.stock_bots_mapping.get(stock_name)
+            if bots is None:
+                logging.info(f'Add new pair={stock_name} to pool')
+                bots = self.stock_bots_mapping[stock_name] = {}
+
+            bots[bot.id] = bot
+            self.bots[bot.id] = bot
+            self.bot_pairs[bot.id] = stock_name
+            self.bot_locks[bot.id] = threading.Lock()
+
+            if self.shards is not None:
+                self.shards.add_bot(stock_name, bot, start_history, is_started)
+
+        logging.info(f'Successfully added bot {bot} to pool pair={stock_name}')
+
+    def add_many(self, bots: Iterable[BotBase]):
+        with self.lock:
+            added = 0
+            for bot in bots:
+                self.add(bot.pair, bot)
+                added += 1
+
+        logging.info(f'Successfully added {added} bots to pool')
 
     def remove(self, stock_name: str, bot_id: int) -> bool:
         logging.info(f'pool.remove(pair={stock_name}, bot_id={bot_id})')
 
-        # get bots on pair
-        bots = self.stock_bots_mapping.get(stock_name)
-        if bots is None:
-            logging.info(f'There is no bots on pair {stock_name}')
-            return False
+        with self.lock:
+            if self.bot_pairs.get(bot_id) != stock_name:
+                logging.info(f'There is no bot with id={bot_id} on pair {stock_name}')
+                return False
 
-        # remove bot
-        removed = False
-        for bot in bots:
-            if bot.id == bot_id:
-                logging.info(f'Remove bot {bot} from pool pair={stock_name}')
-                self.stock_bots_mapping[stock_name].remove(bot)
-                del bot
-                removed = True
+            # remove bot
+            bots = self.stock_bots_mapping[stock_name]
+            logging.info(f'Remove bot {bots[bot_id]} from pool pair={stock_name}')
+            del bots[bot_id]
+            del self.bots[bot_id]
+            del self.bot_pairs[bot_id]
+            del self.bot_locks[bot_id]
 
-        if not removed:
-            return False
+            if self.shards is not None:
+                self.shards.remove_bot(stock_name, bot_id)
+
+            # delete pair from pool if no bots are on it
+            if len(bots) == 0:
+                logging.info(f'Remove stock_name={stock_name} from pool')
+                del self.stock_bots_mapping[stock_name]
+
+        return True
+
+    def remove_many(self, bot_ids: Iterable[int]) -> int:
+        removed = 0
+
+        with self.lock:
+            for bot_id in bot_ids:
+                stock_name = self.bot_pairs.get(bot_id)
+                if stock_name is not None and self.remove(stock_name, bot_id):
+                    removed += 1
+
+        logging.info(f'Successfully removed {removed} bots from pool')
+        return removed
+
+    def move(self, bot_id: int, new_stock_name: str) -> bool:
+        logging.info(f'Pool.move(bot_id={bot_id}, new_pair={new_stock_name})')
+
+        with self.lock:
+            bot = self.bots.get(bot_id)
+            if bot is None:
+                return False
 
-        # delete pair from pool if no bots are on it
-        if len(self.stock_bots_mapping[stock_name]) == 0:
-            logging.info(f'Remove stock_name={stock_name} from pool')
-            del self.stock_bots_mapping[stock_name]
+            self.add(new_stock_name, bot)
 
         return True
 
     def run_bots(self, stock_name: str, new_price: float):
-        logging.info(f'Pool.run_bots() | stock_bots_mapping={self.stock_bots_mapping}')
+        logging.info(f'Pool.run_bots() | pair={stock_name}')
 
         bots = self.stock_bots_mapping.get(stock_name)
         if bots is None:
             logging.info(f'Pool.run_bots() | pair is not in the pool')
             return
 
-        # todo: add multithreading
-        for bot in bots:
-            bot.step(new_price)
+        if self.shards is not None:
+            self.shards.send_tick(stock_name, [new_price])
+            return
 
-    def get_bot(self, bot_id: int) -> None or TrendFollowingBot:
-        bots_lists = self.stock_bots_mapping.values()
+        # Orders made within the tick can be netted
+        with order_executor.batch(stock_name):
+            self.step_bots([(bot, [new_price]) for bot in list(bots.values())])
 
-        for bots in bots_lists:
-            for bot in bots:
-                if bot.id == bot_id:
-                    return bot
+    def run_bots_coalesced(self, stock_name: str, new_prices: list[float], coalesce_all: bool = False) -> int:
+        # Returns number of skipped bot steps: every bot which gets only the latest price skips the rest
+        logging.info(f'Pool.run_bots_coalesced() | pair={stock_name}, prices={len(new_prices)}')
+
+        bots = self.stock_bots_mapping.get(stock_name)
+        if bots is None:
+            logging.info(f'Pool.run_bots_coalesced() | pair is not in the pool')
+            return 0
+
+        # Bots which can skip prices get only the latest one, shards make the same choice on their bots
+        steps = [(bot, new_prices[-1:] if coalesce_all or bot.coalesce_ticks else new_prices)
+                 for bot in list(bots.values())]
+        skipped = sum(len(new_prices) - len(bot_prices) for _, bot_prices in steps)
+
+        if self.shards is not None:
+            self.shards.send_tick(stock_name, new_prices, coalesce_all)
+            return skipped
+
+        with order_executor.batch(stock_name):
+            self.step_bots(steps)
+
+        return skipped
+
+    def step_bot(self, bot: BotBase, new_prices: list[float]):
+        lock = self.bot_locks.get(bot.id)
+        if lock is None:
+            # Bot has been removed from the pool
+            return
+
+        with lock:
+            for new_price in new_prices:
+                try:
+                    bot.step(new_price)
+                except Exception:
+                    logging.exception(f'Step failed for bot={bot}')
+
+    def step_bots(self, steps: list[tuple[BotBase, list[float]]]):
+        # Returns after every bot has processed its prices, so ticks of a pair stay ordered for each bot
+        if self.execution_mode == 'serial' or len(steps) <= 1:
+            for bot, new_prices in steps:
+                self.step_bot(bot, new_prices)
+        else:
+            wait([self.executor.submit(self.step_bot, bot, new_prices) for bot, new_prices in steps])
+
+    def update_bot(self, bot_id: int, parameters: dict) -> bool:
+        bot = self.bots.get(bot_id)
+        if bot is None:
+            return False
 
-        return None
+        bot.update_parameters(parameters)
+
+        if self.shards is not None:
+            self.shards.update_bot(self.bot_pairs[bot_id], bot_id, parameters)
+
+        return True
+
+    def move_pair_to_shard(self, stock_name: str, shard_id: int) -> bool:
+        if self.shards is None or stock_name not in self.stock_bots_mapping:
+            return False
+
+        self.shards.move_pair(stock_name, shard_id)
+        return True
+
+    def get_checkpoint_bots(self) -> list[tuple[str, BotBase, LockType]]:
+        # In sharded mode bots are checkpointed by the shards
+        if self.shards is not None:
+            return []
+
+        with self.lock:
+            return [(self.bot_pairs[bot_id], bot, self.bot_locks[bot_id]) for bot_id, bot in self.bots.items()]
+
+    def restore(self, bots: list[tuple[str, BotBase]]):
+        with self.lock:
+            for stock_name, bot in bots:
+                self.add(stock_name, bot)
+
+                # Shards restore bots themselves
+                if self.shards is None:
+                    bot.on_restore()
+
+        logging.info(f'Successfully restored {len(bots)} bots to pool')
+
+    def get_bot(self, bot_id: int) -> None or TrendFollowingBot:
+        return self.bots.get(bot_id)
 
     def find_bot(self, pair: str, bot_id: int) -> None or TrendFollowingBot:
-        # get bots on pair
-        bots = self.stock_bots_mapping.get(pair)
-        if bots is None:
-            logging.info(f'There is no bots on pair {pair}')
+        if self.bot_pairs.get(bot_id) != pair:
+            logging.info(f'There is no bot with id={bot_id} on pair {pair}')
             return None
 
-        for bot in bots:
-            if bot.id == bot_id:
-                logging.info(f'Found bot {bot}')
-                return bot
-
-        return None
+        bot = self.bots.get(bot_id)
+        logging.info(f'Found bot {bot}')
+        return bot
 
     def start_bot(self, pair: str, bot_id: int) -> bool:
         logging.info(f'Pool.start_bot(pair={pair}, bot_id={bot_id})')
@@ -102,7 +289,10 @@ class Pool:
         if bot is None:
             return False
 
-        bot.start()
+        if self.shards is not None:
+            self.shards.call_bot(pair, bot_id, 'start')
+        else:
+            bot.start()
         return True
 
     def stop_bot(self, pair: str, bot_id: int) -> bool:
@@ -112,5 +302,8 @@ class Pool:
         if bot is None:
             return False
 
-        bot.stop()
+        if self.shards is not None:
+            self.shards.call_bot(pair, bot_id, 'stop')
+        else:
+            bot.stop()
         return True
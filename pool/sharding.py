@@ -0,0 +1,329 @@
+import logging
+import multiprocessing
+import queue
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Callable
+
+from config.settings import POOL_CHECKPOINT_DIR, POOL_CHECKPOINT_INTERVAL, POOL_SHARD_WARM_UP_WORKERS, EXCHANGE_MODE
+from algorithms.bots.base import BotBase
+from pool.checkpoint import PoolCheckpointer
+from services.transaction_journal import transaction_journal
+from services.status_writer import bot_status_writer
+from services.order_executor import order_executor
+from services.simulated_exchange import simulated_exchange, use_simulated_exchange
+
+
+# Bot fields mirrored from shards to the main process after every tick
+SHARED_STATE_FIELDS = ('status', 'invested_in_pair', 'quote_asset_balance', 'base_asset_balance',
+                       'total_balance_in_quote_asset')
+
+
+def get_shared_state(bot: BotBase) -> tuple:
+    return tuple(getattr(bot, field) for field in SHARED_STATE_FIELDS)
+
+
+def run_shard(shard_id: int, connection) -> None:
+    """
+    Shard process: owns bots of its pairs and steps them on every tick received from the main process.
+
+    Messages from the main process:
+        ('tick', pair, new_prices, coalesce_all), ('add', pair, bot, history, is_started), ('remove', bot_id),
+        ('update', bot_id, parameters), ('call', bot_id, method_name), ('export', pair), ('import', pair, bots), ('stop',)
+    Messages to the main process:
+        ('state', [(bot_id, state), ...]), ('exported', pair, bots)
+
+    New bots are warmed up in worker threads and join their pair when done, until then ticks pass them by.
+    """
+    logging.info(f'Shard {shard_id} is started')
+
+    # Spawned process doesn't inherit the main process setup, so real orders of its bots would go to Binance
+    is_simulated = EXCHANGE_MODE == 'simulated'
+    if is_simulated:
+        use_simulated_exchange(simulated_exchange)
+
+    transaction_journal.start()
+    bot_status_writer.start()
+    order_executor.start()
+
+    stock_bots_mapping: dict[str, dict[int, BotBase]] = {}
+    bot_pairs: dict[int, str] = {}
+    states: dict[int, tuple] = {}
+
+    # Messages are processed and fills are applied under the same lock
+    lock = threading.Lock()
+    order_executor.bot_lock_provider = lambda bot_id: lock
+
+    # Bots are checkpointed between messages, so no lock is needed
+    checkpointer = PoolCheckpointer(
+        lambda: [(pair, bot, None) for pair, bots in stock_bots_mapping.items() for bot in bots.values()],
+        POOL_CHECKPOINT_DIR, POOL_CHECKPOINT_INTERVAL
+    )
+
+    # bot_id -> (pair, bot, warm up future, messages received during warm up)
+    warming_bots: dict[int, tuple[str, BotBase, Future, list[tuple]]] = {}
+    warm_up_executor = ThreadPoolExecutor(max_workers=max(1, POOL_SHARD_WARM_UP_WORKERS),
+                                          thread_name_prefix=f'pool-shard-{shard_id}-warm-up')
+
+    def warm_up(bot: BotBase, history: list[float] = None):
+        try:
+            bot.start(history)
+        except Exception:
+            logging.exception(f'Shard {shard_id} | start failed for bot={bot}')
+
+        with lock:
+            warming = warming_bots.pop(bot.id, None)
+            # Bot has been removed during warm up
+            if warming is None:
+                return
+
+            pair, _, _, deferred_messages = warming
+            stock_bots_mapping.setdefault(pair, {})[bot.id] = bot
+            bot_pairs[bot.id] = pair
+            for message in deferred_messages:
+                process(message)
+            send_changed_states([bot])
+
+    def add(pair: str, bot: BotBase, history: list[float] = None, is_started: bool = True):
+        # New bots are started here and not in the main process, started ones only restart background work
+        if not is_started:
+            # Called under the lock, so warm up can't finish before its entry is registered
+            warming_bots[bot.id] = (pair, bot, warm_up_executor.submit(warm_up, bot, history), [])
+            return
+
+        stock_bots_mapping.setdefault(pair, {})[bot.id] = bot
+        bot_pairs[bot.id] = pair
+        bot.on_restore()
+
+    def remove(bot_id: int) -> BotBase | None:
+        if warming_bots.pop(bot_id, None) is not None:
+            # Warm up keeps running, but the bot doesn't join its pair
+            return None
+
+        pair = bot_pairs.pop(bot_id, None)
+        if pair is None:
+            return None
+
+        states.pop(bot_id, None)
+        bot = stock_bots_mapping[pair].pop(bot_id)
+        if not stock_bots_mapping[pair]:
+            del stock_bots_mapping[pair]
+
+        return bot
+
+    def send_changed_states(bots: list[BotBase]):
+        changed = []
+        for bot in bots:
+            state = get_shared_state(bot)
+            if states.get(bot.id) != state:
+                states[bot.id] = state
+                changed.append((bot.id, state))
+
+        if changed:
+            connection.send(('state', changed))
+
+    def wait_warm_ups(pair: str = None):
+        # Called without the lock, warm ups publish their bots under it
+        with lock:
+            futures = [future for warming_pair, _, future, _ in warming_bots.values()
+                       if pair is None or warming_pair == pair]
+        wait(futures)
+
+    def process(message: tuple) -> bool:
+        # Called under the lock, returns False when the shard should stop
+        command = message[0]
+        try:
+            if command == 'tick':
+                _, pair, new_prices, coalesce_all = message
+                if is_simulated:
+                    simulated_exchange.set_price(pair, new_prices[-1])
+
+                bots = list(stock_bots_mapping.get(pair, {}).values())
+                with order_executor.batch(pair):
+                    for bot in bots:
+                        for new_price in (new_prices[-1:] if coalesce_all or bot.coalesce_ticks else new_prices):
+                            try:
+                                bot.step(new_price)
+                            except Exception:
+                                logging.exception(f'Shard {shard_id} | step failed for bot={bot}')
+                send_changed_states(bots)
+            elif command == 'add':
+                _, pair, bot, history, is_started = message
+                add(pair, bot, history, is_started)
+            elif command == 'remove':
+                remove(message[1])
+            elif command in ('update', 'call') and message[1] in warming_bots:
+                # Applied when warm up is done, so they don't race with it
+                warming_bots[message[1]][3].append(message)
+            elif command == 'update':
+                _, bot_id, parameters = message
+                bot = stock_bots_mapping[bot_pairs[bot_id]][bot_id]
+                bot.update_parameters(parameters)
+            elif command == 'call':
+                _, bot_id, method_name = message
+                bot = stock_bots_mapping[bot_pairs[bot_id]][bot_id]
+                getattr(bot, method_name)()
+                send_changed_states([bot])
+            elif command == 'export':
+                pair = message[1]
+                bots = [remove(bot_id) for bot_id in list(stock_bots_mapping.get(pair, {}))]
+                checkpointer.forget([bot.id for bot in bots])
+                connection.send(('exported', pair, bots))
+            elif command == 'import':
+                _, pair, bots = message
+                for bot in bots:
+                    add(pair, bot)
+            elif command == 'stop':
+                if POOL_CHECKPOINT_INTERVAL > 0:
+                    checkpointer.checkpoint()
+                return False
+            else:
+                logging.error(f'Shard {shard_id} | unknown command {command}')
+        except Exception:
+            logging.exception(f'Shard {shard_id} | failed to process command {command}')
+
+        return True
+
+    while True:
+        with lock:
+            checkpointer.maybe_checkpoint()
+
+        if not connection.poll(POOL_CHECKPOINT_INTERVAL or None):
+            continue
+
+        message = connection.recv()
+
+        # Bots of an exported pair and bots checkpointed on stop should be warmed up
+        if message[0] in ('export', 'stop'):
+            wait_warm_ups(message[1] if message[0] == 'export' else None)
+
+        with lock:
+            if not process(message):
+                break
+
+    warm_up_executor.shutdown(wait=True)
+    order_executor.stop()
+    transaction_journal.stop()
+    bot_status_writer.stop()
+    logging.info(f'Shard {shard_id} is stopped')
+
+
+class Shard:
+    def __init__(self, shard_id: int, context, on_states: Callable[[list], None]):
+        self.id = shard_id
+        self.connection, child_connection = context.Pipe()
+        self.process = context.Process(target=run_shard, args=(shard_id, child_connection),
+                                       name=f'pool-shard-{shard_id}', daemon=True)
+        self.process.start()
+        child_connection.close()
+
+        # Pipe is not thread safe, sends from different threads are serialized
+        self.send_lock = threading.Lock()
+        self.exports = queue.Queue()
+
+        self.on_states = on_states
+        self.reader = threading.Thread(target=self.read, name=f'pool-shard-{shard_id}-reader', daemon=True)
+        self.reader.start()
+
+    def send(self, message: tuple) -> None:
+        with self.send_lock:
+            self.connection.send(message)
+
+    def read(self) -> None:
+        while True:
+            try:
+                message = self.connection.recv()
+            except (EOFError, OSError):
+                logging.info(f'Shard {self.id} connection is closed')
+                return
+
+            if message[0] == 'state':
+                self.on_states(message[1])
+            elif message[0] == 'exported':
+                self.exports.put(message)
+
+    def stop(self) -> None:
+        self.send(('stop',))
+        self.process.join(timeout=10)
+        self.connection.close()
+
+
+class ShardedExecutor:
+    """
+    Distributes pairs across worker processes, every pair is owned by exactly one shard.
+
+    Ticks are routed to the owning shard over a pipe, shards send back states of bots which changed.
+    Pairs can be moved to another shard together with their bots.
+    """
+
+    def __init__(self, shards_number: int, on_states: Callable[[list], None]):
+        if shards_number <= 0:
+            raise ValueError(f'Shards number should be greater than zero, but provided {shards_number}')
+
+        logging.info(f'Start ShardedExecutor with {shards_number} shards')
+
+        # Spawn, not fork: the main process runs threads and holds db connections
+        context = multiprocessing.get_context('spawn')
+        self.shards = [Shard(shard_id, context, on_states) for shard_id in range(shards_number)]
+        self.pair_shards: dict[str, int] = {}
+        self.lock = threading.RLock()
+
+    def get_shard(self, pair: str) -> Shard:
+        with self.lock:
+            shard_id = self.pair_shards.get(pair)
+            if shard_id is None:
+                # Assign new pair to the least loaded shard
+                loads = [0] * len(self.shards)
+                for assigned_shard_id in self.pair_shards.values():
+                    loads[assigned_shard_id] += 1
+                shard_id = self.pair_shards[pair] = loads.index(min(loads))
+                logging.info(f'Pair {pair} is assigned to shard {shard_id}')
+
+            return self.shards[shard_id]
+
+    def add_bot(self, pair: str, bot: BotBase, history: list[float] = None, is_started: bool = True) -> None:
+        with self.lock:
+            self.get_shard(pair).send(('add', pair, bot, history, is_started))
+
+    def remove_bot(self, pair: str, bot_id: int) -> None:
+        with self.lock:
+            self.get_shard(pair).send(('remove', bot_id))
+
+    def update_bot(self, pair: str, bot_id: int, parameters: dict) -> None:
+        with self.lock:
+            self.get_shard(pair).send(('update', bot_id, parameters))
+
+    def call_bot(self, pair: str, bot_id: int, method_name: str) -> None:
+        with self.lock:
+            self.get_shard(pair).send(('call', bot_id, method_name))
+
+    def send_tick(self, pair: str, new_prices: list[float], coalesce_all: bool = False) -> None:
+        with self.lock:
+            self.get_shard(pair).send(('tick', pair, new_prices, coalesce_all))
+
+    def move_pair(self, pair: str, shard_id: int) -> None:
+        logging.info(f'ShardedExecutor.move_pair(pair={pair}, shard_id={shard_id})')
+
+        # Ticks of the pair wait until bots are moved, so no tick is lost or reordered
+        with self.lock:
+            old_shard = self.get_shard(pair)
+            if old_shard.id == shard_id:
+                return
+
+            old_shard.send(('export', pair))
+            _, _, bots = old_shard.exports.get(timeout=60)
+
+            self.shards[shard_id].send(('import', pair, bots))
+            self.pair_shards[pair] = shard_id
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                'shards': len(self.shards),
+                'pair_shards': dict(self.pair_shards)
+            }
+
+    def stop(self) -> None:
+        logging.info('Stop ShardedExecutor')
+        for shard in self.shards:
+            shard.stop()
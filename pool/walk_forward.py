@@ -0,0 +1,156 @@
+import logging
+import threading
+import time
+
+from algorithms.bots.base import BotStatus
+from algorithms.bots.trend_following import TrendFollowingBot
+from algorithms.optimization.sma_search import get_window_pairs
+from algorithms.optimization.walk_forward import IncrementalWindowsScorer
+from pool.pool import Pool
+
+
+class WalkForwardOptimizer:
+    """
+    Periodic walk-forward re-optimization of windows of running trend following bots.
+
+    Prices of received ticks are buffered per pair, every run passes only the new ones to incremental scorers.
+    Bots of a pair with the same search bounds share a scorer. The best windows on the latest history_size prices
+    are swapped into bots in place under their locks, bots are not paused and keep their status.
+    Bots live in shard processes in sharded mode and are not re-optimized there.
+    """
+
+    def __init__(self, pool: Pool, interval: float, history_size: int):
+        self.pool = pool
+        self.interval = interval
+        self.history_size = history_size
+
+        # pair -> prices received since the previous run
+        self.new_prices: dict[str, list[float]] = {}
+        self.prices_lock = threading.Lock()
+
+        # (pair, fast_min, fast_max, slow_max, fast_slow_min_delta) -> scorer
+        self.scorers: dict[tuple, IncrementalWindowsScorer] = {}
+
+        self.thread = None
+        self.stop_event = threading.Event()
+
+        # Counters
+        self.runs = 0
+        self.scored_prices = 0
+        self.swaps = 0
+        self.skipped_swaps = 0
+        self.last_run_duration = 0.
+
+    def on_price(self, pair: str, price: float) -> None:
+        # Called from the event loop with every received tick, so it only appends
+        with self.prices_lock:
+            self.new_prices.setdefault(pair, []).append(price)
+
+    def get_adaptive_bots(self) -> dict[tuple, list[TrendFollowingBot]]:
+        groups = {}
+        with self.pool.lock:
+            for bot_id, bot in self.pool.bots.items():
+                if isinstance(bot, TrendFollowingBot) and bot.adaptive_windows:
+                    key = (self.pool.bot_pairs[bot_id], bot.fast_min, bot.fast_max, bot.slow_max,
+                           bot.fast_slow_min_delta)
+                    groups.setdefault(key, []).append(bot)
+
+        return groups
+
+    def run_once(self) -> int:
+        start_time = time.perf_counter()
+
+        with self.prices_lock:
+            new_prices, self.new_prices = self.new_prices, {}
+
+        groups = self.get_adaptive_bots() if self.pool.shards is None else {}
+
+        # Scorers of bounds without bots are dropped, they start over when such bots come back
+        for key in [key for key in self.scorers if key not in groups]:
+            del self.scorers[key]
+
+        swaps = 0
+        for key, bots in groups.items():
+            pair, fast_min, fast_max, slow_max, fast_slow_min_delta = key
+
+            scorer = self.scorers.get(key)
+            if scorer is None:
+                pairs = get_window_pairs(fast_min, fast_max, slow_max, fast_slow_min_delta)
+                if not len(pairs):
+                    continue
+                scorer = self.scorers[key] = IncrementalWindowsScorer(pairs, self.history_size)
+
+            prices = new_prices.get(pair, [])
+            scorer.update(prices)
+            self.scored_prices += len(prices)
+
+            # Every window should be filled a few times before windows are swapped
+            if scorer.window_size < 4 * scorer.max_slow:
+                continue
+
+            best = scorer.get_best()
+            if best.slow_window is None:
+                continue
+
+            for bot in bots:
+                if bot.status != BotStatus.RUNNING or \
+                        (bot.slow_window, bot.fast_window) == (best.slow_window, best.fast_window):
+                    continue
+
+                lock = self.pool.bot_locks.get(bot.id)
+                if lock is None:
+                    # Bot has been removed from the pool
+                    continue
+
+                with lock:
+                    is_swapped = bot.set_windows(best.slow_window, best.fast_window)
+
+                if is_swapped:
+                    logging.info(f'Walk-forward windows for bot={bot}: slow={best.slow_window}, '
+                                 f'fast={best.fast_window}, score={best.score}')
+                    swaps += 1
+                else:
+                    self.skipped_swaps += 1
+
+        self.runs += 1
+        self.swaps += swaps
+        self.last_run_duration = time.perf_counter() - start_time
+
+        logging.info(f'Walk-forward run is done | scorers={len(self.scorers)}, swaps={swaps}, '
+                     f'duration={self.last_run_duration:.3f}s')
+        return swaps
+
+    def run(self) -> None:
+        while not self.stop_event.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception:
+                logging.exception('Walk-forward run failed')
+
+    def start(self) -> None:
+        if self.interval <= 0 or self.thread is not None:
+            return
+
+        logging.info(f'Start WalkForwardOptimizer | interval={self.interval}, history_size={self.history_size}')
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.run, name='walk-forward', daemon=True)
+        self.thread.start()
+
+    def stop(self) -> None:
+        if self.thread is None:
+            return
+
+        logging.info('Stop WalkForwardOptimizer')
+        self.stop_event.set()
+        self.thread.join()
+        self.thread = None
+
+    def stats(self) -> dict:
+        return {
+            'scorers': len(self.scorers),
+            'runs': self.runs,
+            'scored_prices': self.scored_prices,
+            'swaps': self.swaps,
+            'skipped_swaps': self.skipped_swaps,
+            'last_run_duration': self.last_run_duration
+        }
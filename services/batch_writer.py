@@ -0,0 +1,125 @@
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from sqlalchemy.orm.session import Session
+
+from config.settings import SessionLocal
+
+
+class BackgroundBatchWriter(ABC):
+    """
+    Base class for writers which collect rows from bot threads and write them to db in batches
+    from a background thread, either every flush interval or as soon as batch_size rows are pending.
+    """
+
+    name = 'batch-writer'
+
+    def __init__(self, batch_size: int, flush_interval: float):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.wake_event = threading.Event()
+        self.is_stopping = False
+        self.thread = None
+
+        # Counters
+        self.flushed = 0
+        self.failed = 0
+        self.flushes = 0
+        self.last_flush_latency = 0.
+        self.max_flush_latency = 0.
+
+    @abstractmethod
+    def take_batch(self) -> list:
+        # Take pending items under self.lock
+        pass
+
+    @abstractmethod
+    def write(self, batch: list, db: Session) -> None:
+        pass
+
+    def commit(self, batch: list, db: Session) -> None:
+        db.commit()
+
+    def on_failure(self, batch: list) -> None:
+        # Called with the batch which failed to be written
+        self.failed += len(batch)
+
+    @abstractmethod
+    def pending_size(self) -> int:
+        pass
+
+    def wake_up(self) -> None:
+        self.wake_event.set()
+
+    def flush(self) -> int:
+        with self.flush_lock:
+            with self.lock:
+                batch = self.take_batch()
+
+            if not batch:
+                return 0
+
+            start_time = time.perf_counter()
+            written = 0
+            db = SessionLocal()
+            try:
+                self.write(batch, db)
+                self.commit(batch, db)
+                written = len(batch)
+                self.flushed += written
+            except Exception:
+                logging.exception(f'{self.__class__.__name__} failed to flush {len(batch)} items')
+                db.rollback()
+                self.on_failure(batch)
+            finally:
+                db.close()
+
+            self.last_flush_latency = time.perf_counter() - start_time
+            self.max_flush_latency = max(self.max_flush_latency, self.last_flush_latency)
+            self.flushes += 1
+
+            return written
+
+    def run(self) -> None:
+        while not self.is_stopping:
+            self.wake_event.wait(self.flush_interval)
+            self.wake_event.clear()
+            self.flush()
+
+    def start(self) -> None:
+        if self.thread is not None:
+            return
+
+        logging.info(f'Start {self.__class__.__name__} | batch_size={self.batch_size}, '
+                     f'flush_interval={self.flush_interval}')
+        self.is_stopping = False
+        self.thread = threading.Thread(target=self.run, name=self.name, daemon=True)
+        self.thread.start()
+
+    def stop(self) -> None:
+        if self.thread is None:
+            return
+
+        logging.info(f'Stop {self.__class__.__name__} | pending={self.pending_size()}')
+        self.is_stopping = True
+        self.wake_up()
+        self.thread.join()
+        self.thread = None
+
+        # Write everything left, stop if db keeps failing
+        while self.pending_size() and self.flush():
+            pass
+
+    def stats(self) -> dict:
+        return {
+            'pending': self.pending_size(),
+            'flushed': self.flushed,
+            'failed': self.failed,
+            'flushes': self.flushes,
+            'last_flush_latency': self.last_flush_latency,
+            'max_flush_latency': self.max_flush_latency
+        }
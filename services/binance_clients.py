@@ -0,0 +1,123 @@
+import asyncio
+import logging
+import time
+from typing import Callable, Awaitable, Any
+from binance import AsyncClient
+
+from config.settings import BALANCE_REFRESH_INTERVAL
+from services.metadata_cache import KeyInfo
+from services.rate_limiter import exchange_rate_limiter, RequestPriority
+
+
+async def create_binance_client(key: KeyInfo) -> AsyncClient:
+    return await AsyncClient.create(api_key=key.api_key, api_secret=key.secret_key)
+
+
+class BinanceClientManager:
+    """
+    Keeps one warm client per key and a cache of free balances of every key.
+
+    Balances are updated from fills of our own orders and are fully refreshed from the exchange
+    once they are older than refresh interval. Should be used from a single event loop (order executor's one).
+    """
+
+    def __init__(self, balance_refresh_interval: float,
+                 client_factory: Callable[[KeyInfo], Awaitable[Any]] = create_binance_client):
+        self.balance_refresh_interval = balance_refresh_interval
+        self.client_factory = client_factory
+
+        self.clients: dict[int, Any] = {}
+        # key_id -> key the client was created with
+        self.client_keys: dict[int, KeyInfo] = {}
+        self.balances: dict[int, dict[str, float]] = {}
+        self.balances_updated_at: dict[int, float] = {}
+        self.locks: dict[int, asyncio.Lock] = {}
+
+        # Counters
+        self.clients_created = 0
+        self.balance_refreshes = 0
+
+    def get_lock(self, key_id: int) -> asyncio.Lock:
+        lock = self.locks.get(key_id)
+        if lock is None:
+            lock = self.locks[key_id] = asyncio.Lock()
+
+        return lock
+
+    async def get_client(self, key: KeyInfo):
+        client = self.clients.get(key.id)
+        if client is not None and self.client_keys.get(key.id) == key:
+            return client
+
+        async with self.get_lock(key.id):
+            client = self.clients.get(key.id)
+            # Key has been changed in db since the client was created
+            if client is not None and self.client_keys.get(key.id) != key:
+                logging.info(f'Recreate exchange client for changed key with id={key.id}')
+                self.clients.pop(key.id)
+                self.invalidate_balances(key.id)
+                try:
+                    await client.close_connection()
+                except Exception:
+                    logging.exception('Failed to close exchange client')
+                client = None
+
+            if client is None:
+                logging.info(f'Create exchange client for key with id={key.id}')
+                client = self.clients[key.id] = await self.client_factory(key)
+                self.client_keys[key.id] = key
+                self.clients_created += 1
+
+        return client
+
+    async def refresh_balances(self, key: KeyInfo, priority: RequestPriority = RequestPriority.ACCOUNT) -> None:
+        client = await self.get_client(key)
+        account_info = await exchange_rate_limiter.call('account', client.get_account, key_id=key.id, priority=priority)
+
+        self.balances[key.id] = {balance['asset']: float(balance['free']) for balance in account_info['balances']}
+        self.balances_updated_at[key.id] = time.monotonic()
+        self.balance_refreshes += 1
+
+    async def get_balance(self, key: KeyInfo, currency: str, priority: RequestPriority = RequestPriority.ACCOUNT) -> float:
+        updated_at = self.balances_updated_at.get(key.id)
+        if updated_at is None or time.monotonic() - updated_at > self.balance_refresh_interval:
+            await self.refresh_balances(key, priority)
+
+        return self.balances[key.id].get(currency, 0.)
+
+    def apply_fill(self, key_id: int, base_currency: str, quote_currency: str,
+                   base_delta: float, quote_delta: float) -> None:
+        balances = self.balances.get(key_id)
+        if balances is None:
+            return
+
+        balances[base_currency] = balances.get(base_currency, 0.) + base_delta
+        balances[quote_currency] = balances.get(quote_currency, 0.) + quote_delta
+
+    def invalidate_balances(self, key_id: int) -> None:
+        self.balances_updated_at.pop(key_id, None)
+
+    async def close(self) -> None:
+        logging.info(f'Close {len(self.clients)} exchange clients')
+
+        for client in self.clients.values():
+            try:
+                await client.close_connection()
+            except Exception:
+                logging.exception('Failed to close exchange client')
+
+        self.clients.clear()
+        self.client_keys.clear()
+        self.balances.clear()
+        self.balances_updated_at.clear()
+        self.locks.clear()
+
+    def stats(self) -> dict:
+        return {
+            'clients': len(self.clients),
+            'clients_created': self.clients_created,
+            'balance_refreshes': self.balance_refreshes
+        }
+
+
+binance_clients = BinanceClientManager(BALANCE_REFRESH_INTERVAL)
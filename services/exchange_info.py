@@ -0,0 +1,192 @@
+import asyncio
+import logging
+import time
+from decimal import Decimal
+from typing import NamedTuple, Callable, Awaitable, Any
+from binance import AsyncClient
+
+from config.settings import EXCHANGE_INFO_REFRESH_INTERVAL
+from api.data_api.preprocessing import float_to_str
+from exceptions.exchange_exceptions import OrderFilterError
+from services.rate_limiter import exchange_rate_limiter, RequestPriority
+
+
+def round_down(value: float, step: Decimal) -> Decimal:
+    value = Decimal(float_to_str(value))
+    if not step:
+        return value
+
+    return value // step * step
+
+
+def decimal_to_str(value: Decimal) -> str:
+    return format(value.normalize(), 'f')
+
+
+class SymbolInfo(NamedTuple):
+    symbol: str
+    base_asset: str
+    quote_asset: str
+    # Steps are zero when the exchange doesn't restrict them
+    step_size: Decimal
+    min_quantity: Decimal
+    max_quantity: Decimal
+    tick_size: Decimal
+    quote_step: Decimal
+    min_notional: Decimal
+
+    def format_quantity(self, quantity: float, price: float) -> str:
+        # Base asset quantity rounded down to the lot step, orders which the exchange would reject raise
+        quantity = round_down(quantity, self.step_size)
+        if self.max_quantity:
+            quantity = min(quantity, self.max_quantity)
+
+        if quantity <= 0 or quantity < self.min_quantity:
+            raise OrderFilterError(f'Quantity {quantity} of {self.symbol} is less than {self.min_quantity}')
+        if quantity * Decimal(float_to_str(price)) < self.min_notional:
+            raise OrderFilterError(f'Order of {quantity} {self.symbol} is less than {self.min_notional} '
+                                   f'{self.quote_asset}')
+
+        return decimal_to_str(quantity)
+
+    def format_quote_quantity(self, quote_quantity: float) -> str:
+        quote_quantity = round_down(quote_quantity, self.quote_step)
+        if quote_quantity <= 0 or quote_quantity < self.min_notional:
+            raise OrderFilterError(f'Order of {quote_quantity} {self.quote_asset} on {self.symbol} '
+                                   f'is less than {self.min_notional}')
+
+        return decimal_to_str(quote_quantity)
+
+    def format_price(self, price: float) -> str:
+        return decimal_to_str(round_down(price, self.tick_size))
+
+
+def parse_symbol_info(symbol: dict) -> SymbolInfo:
+    filters = {symbol_filter['filterType']: symbol_filter for symbol_filter in symbol.get('filters', [])}
+
+    # Market orders are limited by MARKET_LOT_SIZE when its step is set
+    lot_size = filters.get('LOT_SIZE', {})
+    market_lot_size = filters.get('MARKET_LOT_SIZE', {})
+    if Decimal(market_lot_size.get('stepSize', '0')):
+        lot_size = market_lot_size
+
+    notional = filters.get('NOTIONAL') or filters.get('MIN_NOTIONAL') or {}
+    if not notional.get('applyMinToMarket', notional.get('applyToMarket', True)):
+        notional = {}
+
+    quote_precision = symbol.get('quoteAssetPrecision', symbol.get('quotePrecision'))
+
+    return SymbolInfo(
+        symbol=symbol['symbol'],
+        base_asset=symbol['baseAsset'],
+        quote_asset=symbol['quoteAsset'],
+        step_size=Decimal(lot_size.get('stepSize', '0')),
+        min_quantity=Decimal(lot_size.get('minQty', '0')),
+        max_quantity=Decimal(lot_size.get('maxQty', '0')),
+        tick_size=Decimal(filters.get('PRICE_FILTER', {}).get('tickSize', '0')),
+        quote_step=Decimal(1).scaleb(-quote_precision) if quote_precision is not None else Decimal(0),
+        min_notional=Decimal(notional.get('minNotional', '0'))
+    )
+
+
+class ExchangeInfoCache:
+    """
+    Cache of exchange symbols: base and quote assets and filters which orders should satisfy.
+
+    Refreshed from the exchange every refresh interval by a background task and when an unknown
+    symbol is requested. Should be used from a single event loop (order executor's one).
+    """
+
+    # Unknown symbols don't trigger refreshes more often than that
+    min_refresh_interval = 60
+
+    def __init__(self, refresh_interval: float, client_factory: Callable[[], Awaitable[Any]] = AsyncClient.create):
+        self.refresh_interval = refresh_interval
+        self.client_factory = client_factory
+
+        self.client = None
+        self.symbols: dict[str, SymbolInfo] = {}
+        self.updated_at = None
+        self.lock = None
+        self.task = None
+
+        # Counters
+        self.refreshes = 0
+        self.failed_refreshes = 0
+
+    async def refresh(self) -> None:
+        if self.client is None:
+            self.client = await self.client_factory()
+
+        response = await exchange_rate_limiter.call('exchange_info', self.client.get_exchange_info,
+                                                    priority=RequestPriority.ACCOUNT)
+
+        symbols = {}
+        for symbol in response['symbols']:
+            try:
+                symbols[symbol['symbol']] = parse_symbol_info(symbol)
+            except Exception:
+                logging.exception(f'ExchangeInfoCache | failed to parse symbol {symbol.get("symbol")}')
+
+        self.symbols = symbols
+        self.updated_at = time.monotonic()
+        self.refreshes += 1
+        logging.info(f'ExchangeInfoCache | {len(symbols)} symbols are refreshed')
+
+    async def run(self) -> None:
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                async with self.lock:
+                    await self.refresh()
+            except Exception:
+                logging.exception('ExchangeInfoCache | refresh failed')
+                self.failed_refreshes += 1
+
+    def start(self) -> None:
+        if self.task is None:
+            self.lock = asyncio.Lock()
+            self.task = asyncio.create_task(self.run())
+
+    async def get_symbol(self, symbol: str) -> SymbolInfo | None:
+        self.start()
+
+        symbol_info = self.symbols.get(symbol)
+        if symbol_info is not None:
+            return symbol_info
+
+        # Symbol could be listed after the last refresh
+        async with self.lock:
+            if symbol not in self.symbols and \
+                    (self.updated_at is None or time.monotonic() - self.updated_at > self.min_refresh_interval):
+                await self.refresh()
+
+        return self.symbols.get(symbol)
+
+    async def close(self) -> None:
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+            self.lock = None
+
+        if self.client is not None:
+            try:
+                await self.client.close_connection()
+            except Exception:
+                logging.exception('Failed to close exchange client')
+            self.client = None
+
+    def stats(self) -> dict:
+        return {
+            'symbols': len(self.symbols),
+            'age': time.monotonic() - self.updated_at if self.updated_at is not None else None,
+            'refreshes': self.refreshes,
+            'failed_refreshes': self.failed_refreshes
+        }
+
+
+exchange_info = ExchangeInfoCache(EXCHANGE_INFO_REFRESH_INTERVAL)
@@ -0,0 +1,161 @@
+import asyncio
+import logging
+import time
+
+from config.settings import SessionLocal, KLINE_BUFFER_MAX_SIZE, KLINE_FLUSH_BATCH_SIZE, KLINE_FLUSH_INTERVAL, \
+    KLINE_FLUSH_MAX_RETRIES
+from api.data_api.db_stuff import add_klines_to_db
+
+
+class KlineWriter:
+    """
+    Write-behind buffer for Kline rows.
+
+    Ticks are pushed into a bounded queue and flushed to db in batches by a background task
+    once the batch is full or flush interval has passed. When the queue is full push waits (backpressure).
+    Failed batches are retried up to max_retries times with exponential backoff, the queue is not drained meanwhile.
+    """
+
+    def __init__(self, max_buffer_size: int, batch_size: int, flush_interval: float, max_retries: int = 0):
+        self.max_buffer_size = max_buffer_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+
+        self.queue = None
+        self.task = None
+        self.is_stopping = False
+
+        # Counters
+        self.pushed = 0
+        self.flushed = 0
+        self.failed = 0
+        self.retries = 0
+        self.flushes = 0
+        self.last_flush_latency = 0.
+        self.max_flush_latency = 0.
+        self.total_flush_latency = 0.
+
+    async def start(self) -> None:
+        if self.task is not None:
+            return
+
+        logging.info(f'Start KlineWriter | max_buffer_size={self.max_buffer_size}, '
+                     f'batch_size={self.batch_size}, flush_interval={self.flush_interval}, '
+                     f'max_retries={self.max_retries}')
+        self.queue = asyncio.Queue(maxsize=self.max_buffer_size)
+        self.is_stopping = False
+        self.task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        if self.task is None:
+            return
+
+        logging.info(f'Stop KlineWriter | queue_depth={self.queue.qsize()}')
+        self.is_stopping = True
+        await self.task
+        self.task = None
+
+        # Flush everything left in the buffer
+        while not self.queue.empty():
+            await self.flush(self.fill_batch([]))
+
+    async def push(self, kline: dict) -> None:
+        await self.queue.put(kline)
+        self.pushed += 1
+
+    async def push_many(self, klines: list[dict]) -> None:
+        for kline in klines:
+            await self.push(kline)
+
+    def fill_batch(self, batch: list[dict]) -> list[dict]:
+        while len(batch) < self.batch_size and not self.queue.empty():
+            batch.append(self.queue.get_nowait())
+
+        return batch
+
+    async def run(self) -> None:
+        batch = []
+        deadline = None
+
+        while not self.is_stopping:
+            # Wait for the next kline, but not longer than the batch deadline
+            timeout = self.flush_interval if deadline is None else deadline - time.monotonic()
+            if timeout > 0:
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                    self.fill_batch(batch)
+                except asyncio.TimeoutError:
+                    pass
+
+            if not batch:
+                continue
+
+            if deadline is None:
+                deadline = time.monotonic() + self.flush_interval
+
+            # Flush if batch is full or flush interval has passed
+            if len(batch) >= self.batch_size or time.monotonic() >= deadline:
+                await self.flush(batch)
+                batch = []
+                deadline = None
+
+        await self.flush(batch)
+
+    async def flush(self, batch: list[dict]) -> None:
+        if not batch:
+            return
+
+        start_time = time.perf_counter()
+        for attempt in range(self.max_retries + 1):
+            try:
+                # Batch is inserted in one transaction, so a failed one is retried as a whole
+                await asyncio.to_thread(self.write, batch)
+                self.flushed += len(batch)
+                break
+            except Exception:
+                if attempt == self.max_retries:
+                    logging.exception(f'KlineWriter failed to flush {len(batch)} klines, they are dropped')
+                    self.failed += len(batch)
+                    break
+
+                delay = self.flush_interval * 2 ** attempt
+                logging.warning(f'KlineWriter failed to flush {len(batch)} klines, retry in {delay:.2f}s',
+                                exc_info=True)
+                self.retries += 1
+                await asyncio.sleep(delay)
+
+        self.last_flush_latency = time.perf_counter() - start_time
+        self.max_flush_latency = max(self.max_flush_latency, self.last_flush_latency)
+        self.total_flush_latency += self.last_flush_latency
+        self.flushes += 1
+
+    @staticmethod
+    def write(batch: list[dict]) -> None:
+        db = SessionLocal()
+        try:
+            add_klines_to_db(batch, db)
+        finally:
+            db.close()
+
+    def stats(self) -> dict:
+        return {
+            'queue_depth': self.queue.qsize() if self.queue is not None else 0,
+            'max_buffer_size': self.max_buffer_size,
+            'pushed': self.pushed,
+            'flushed': self.flushed,
+            'failed': self.failed,
+            'retries': self.retries,
+            'flushes': self.flushes,
+            'last_flush_latency': self.last_flush_latency,
+            'max_flush_latency': self.max_flush_latency,
+            'avg_flush_latency': self.total_flush_latency / self.flushes if self.flushes else 0.
+        }
+
+
+kline_writer = KlineWriter(KLINE_BUFFER_MAX_SIZE, KLINE_FLUSH_BATCH_SIZE, KLINE_FLUSH_INTERVAL,
+                           KLINE_FLUSH_MAX_RETRIES)
+
+
+def get_kline_writer() -> KlineWriter:
+    return kline_writer
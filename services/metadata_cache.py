@@ -0,0 +1,204 @@
+import logging
+import threading
+import time
+from typing import NamedTuple, Iterable
+from sqlalchemy.orm.session import Session
+
+from config.settings import METADATA_CACHE_MISSING_TTL
+from models.models_ import Bot, BotType, Stock, Key
+
+
+class KeyInfo(NamedTuple):
+    id: int
+    api_key: str
+    secret_key: str
+
+
+class BotTypeInfo(NamedTuple):
+    id: int
+    name: str
+    parameters_schema: dict
+
+
+class MetadataCache:
+    """
+    In-process cache of small and rarely changing tables (Stocks, BotTypes, Keys) and of bot -> stock relation.
+
+    Misses are loaded from db and remembered. Absent rows are not cached, except unknown pairs:
+    they come with every tick, so they are remembered as absent for missing_ttl seconds.
+    Whoever changes these tables must invalidate the corresponding entries.
+    """
+
+    def __init__(self, missing_ttl: float = 0.):
+        self.lock = threading.Lock()
+        self.missing_ttl = missing_ttl
+
+        self.stock_ids: dict[str, int] = {}
+        # name -> time until which the stock is known to be absent
+        self.missing_stocks: dict[str, float] = {}
+        self.stock_names: dict[int, str] = {}
+        self.keys: dict[int, KeyInfo] = {}
+        self.bot_types: dict[str, BotTypeInfo] = {}
+        self.bot_types_by_id: dict[int, BotTypeInfo] = {}
+        self.bot_stock_ids: dict[int, int] = {}
+
+    def set_stock(self, stock_id: int, name: str) -> None:
+        with self.lock:
+            self.stock_ids[name] = stock_id
+            self.stock_names[stock_id] = name
+            self.missing_stocks.pop(name, None)
+
+    def set_missing_stocks(self, names: Iterable[str]) -> None:
+        if self.missing_ttl <= 0:
+            return
+
+        expires_at = time.monotonic() + self.missing_ttl
+        with self.lock:
+            for name in names:
+                self.missing_stocks[name] = expires_at
+
+    def is_missing_stock(self, name: str) -> bool:
+        expires_at = self.missing_stocks.get(name)
+        return expires_at is not None and expires_at > time.monotonic()
+
+    def get_stock_id(self, name: str, db: Session) -> int | None:
+        stock_id = self.stock_ids.get(name)
+        if stock_id is not None:
+            return stock_id
+        if self.is_missing_stock(name):
+            return None
+
+        stock = db.query(Stock.id).filter(Stock.name == name).first()
+        if stock is None:
+            self.set_missing_stocks([name])
+            return None
+
+        self.set_stock(stock.id, name)
+        return stock.id
+
+    def get_stock_ids(self, names: Iterable[str], db: Session) -> dict[str, int]:
+        stock_ids = {}
+        missing = set()
+        for name in names:
+            stock_id = self.stock_ids.get(name)
+            if stock_id is not None:
+                stock_ids[name] = stock_id
+            elif not self.is_missing_stock(name):
+                missing.add(name)
+
+        if missing:
+            for name, stock_id in db.query(Stock.name, Stock.id).filter(Stock.name.in_(missing)).all():
+                self.set_stock(stock_id, name)
+                stock_ids[name] = stock_id
+
+            self.set_missing_stocks(missing - stock_ids.keys())
+
+        return stock_ids
+
+    def get_stock_name(self, stock_id: int, db: Session) -> str | None:
+        name = self.stock_names.get(stock_id)
+        if name is not None:
+            return name
+
+        stock = db.query(Stock.name).filter(Stock.id == stock_id).first()
+        if stock is None:
+            return None
+
+        self.set_stock(stock_id, stock.name)
+        return stock.name
+
+    def set_key(self, key: KeyInfo) -> None:
+        with self.lock:
+            self.keys[key.id] = key
+
+    def get_key(self, key_id: int, db: Session) -> KeyInfo | None:
+        key = self.keys.get(key_id)
+        if key is not None:
+            return key
+
+        key = db.query(Key).get(key_id)
+        if key is None:
+            return None
+
+        key = KeyInfo(id=key.id, api_key=key.api_key, secret_key=key.secret_key)
+        with self.lock:
+            self.keys[key_id] = key
+        return key
+
+    def set_bot_type(self, bot_type: BotType) -> BotTypeInfo:
+        bot_type = BotTypeInfo(id=bot_type.id, name=bot_type.name, parameters_schema=bot_type.parameters_schema)
+        with self.lock:
+            self.bot_types[bot_type.name] = bot_type
+            self.bot_types_by_id[bot_type.id] = bot_type
+
+        return bot_type
+
+    def get_bot_type(self, name: str, db: Session) -> BotTypeInfo | None:
+        bot_type = self.bot_types.get(name)
+        if bot_type is not None:
+            return bot_type
+
+        bot_type = db.query(BotType).filter(BotType.name == name).first()
+        return None if bot_type is None else self.set_bot_type(bot_type)
+
+    def get_bot_type_by_id(self, bot_type_id: int, db: Session) -> BotTypeInfo | None:
+        bot_type = self.bot_types_by_id.get(bot_type_id)
+        if bot_type is not None:
+            return bot_type
+
+        bot_type = db.query(BotType).get(bot_type_id)
+        return None if bot_type is None else self.set_bot_type(bot_type)
+
+    def set_bot_stock_id(self, bot_id: int, stock_id: int) -> None:
+        with self.lock:
+            self.bot_stock_ids[bot_id] = stock_id
+
+    def get_bot_stock_id(self, bot_id: int, db: Session) -> int | None:
+        stock_id = self.bot_stock_ids.get(bot_id)
+        if stock_id is not None:
+            return stock_id
+
+        bot = db.query(Bot.stock_id).filter(Bot.id == bot_id).first()
+        if bot is None:
+            return None
+
+        self.set_bot_stock_id(bot_id, bot.stock_id)
+        return bot.stock_id
+
+    def invalidate_stock(self, name: str) -> None:
+        logging.info(f'Invalidate stock {name} in metadata cache')
+
+        with self.lock:
+            self.missing_stocks.pop(name, None)
+            stock_id = self.stock_ids.pop(name, None)
+            if stock_id is None:
+                return
+
+            self.stock_names.pop(stock_id, None)
+
+            # Bots are deleted together with their stock
+            for bot_id in [bot_id for bot_id, bot_stock_id in self.bot_stock_ids.items() if bot_stock_id == stock_id]:
+                del self.bot_stock_ids[bot_id]
+
+    def invalidate_bot(self, bot_id: int) -> None:
+        with self.lock:
+            self.bot_stock_ids.pop(bot_id, None)
+
+    def invalidate_key(self, key_id: int) -> None:
+        logging.info(f'Invalidate key with id={key_id} in metadata cache')
+
+        with self.lock:
+            self.keys.pop(key_id, None)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.stock_ids.clear()
+            self.missing_stocks.clear()
+            self.stock_names.clear()
+            self.keys.clear()
+            self.bot_types.clear()
+            self.bot_types_by_id.clear()
+            self.bot_stock_ids.clear()
+
+
+metadata_cache = MetadataCache(METADATA_CACHE_MISSING_TTL)
@@ -0,0 +1,289 @@
+import asyncio
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import NamedTuple, Callable, Any
+
+from config.settings import SessionLocal, ORDER_EXECUTOR_MAX_CONCURRENCY, ORDER_NETTING_ENABLED
+from algorithms.bots.base_enums import BotAction
+from api.data_api.buy_sell import buy_pair, sell_pair
+from services.binance_clients import binance_clients
+from services.order_netting import net_intents, allocate_fill
+from services.rate_limiter import exchange_rate_limiter, RequestPriority
+from services.exchange_info import exchange_info
+
+
+class OrderIntent(NamedTuple):
+    bot: Any
+    action: BotAction
+    quote_amount: float
+    price: float
+    # Amount of quote (buy) or base (sell) asset held by the bot until the order is filled
+    reserved_amount: float
+    created_at: float
+
+
+def get_priority(intent: OrderIntent) -> RequestPriority:
+    if intent.action == BotAction.BUY:
+        return RequestPriority.BUY
+
+    # Sell at or below the lowest level of the bot cuts losses and goes first
+    min_level = getattr(intent.bot, 'min_level', None)
+    if min_level is not None and intent.price <= min_level:
+        return RequestPriority.STOP_OUT
+
+    return RequestPriority.SELL
+
+
+class OrderExecutor:
+    """
+    Executes real money orders emitted by bots.
+
+    Runs its own event loop in a background thread, so bots submit intents from any thread
+    and never wait for the exchange. Orders of a pair are sent one by one in order of submission,
+    different pairs are sent concurrently. Fills are reconciled back into bots.
+
+    With netting enabled intents submitted within one tick of a pair (see batch()) are aggregated
+    per key into one net market order, its fill is allocated back to the bots pro rata.
+    """
+
+    def __init__(self, max_concurrency: int, netting: bool = False):
+        self.max_concurrency = max_concurrency
+        self.netting = netting
+
+        self.loop = None
+        self.thread = None
+        self.semaphore = None
+        self.queues: dict[str, asyncio.Queue] = {}
+        self.tasks: dict[str, asyncio.Task] = {}
+
+        # pair -> intents submitted during the current tick of the pair
+        self.batches: dict[str, list[OrderIntent]] = {}
+        self.batches_lock = threading.Lock()
+
+        # Returns lock under which bot is stepped, fills are applied under it too
+        self.bot_lock_provider: Callable[[int], threading.Lock | None] = lambda bot_id: None
+
+        # Counters
+        self.submitted = 0
+        self.filled = 0
+        self.failed = 0
+        self.exchange_orders = 0
+        self.last_latency = 0.
+        self.max_latency = 0.
+
+    def start(self) -> None:
+        if self.thread is not None:
+            return
+
+        logging.info(f'Start OrderExecutor | max_concurrency={self.max_concurrency}')
+        self.loop = asyncio.new_event_loop()
+        started = threading.Event()
+
+        def run():
+            asyncio.set_event_loop(self.loop)
+            self.semaphore = asyncio.Semaphore(self.max_concurrency)
+            self.loop.call_soon(started.set)
+            self.loop.run_forever()
+
+        self.thread = threading.Thread(target=run, name='order-executor', daemon=True)
+        self.thread.start()
+        started.wait()
+
+    def stop(self, timeout: float = 30) -> None:
+        if self.thread is None:
+            return
+
+        logging.info(f'Stop OrderExecutor | in_flight={self.in_flight()}')
+
+        # Let submitted orders finish
+        try:
+            asyncio.run_coroutine_threadsafe(self.drain(), self.loop).result(timeout)
+        except Exception:
+            logging.exception('OrderExecutor failed to drain orders')
+
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+        self.loop = None
+        self.thread = None
+        self.queues.clear()
+        self.tasks.clear()
+
+    async def drain(self) -> None:
+        for queue in list(self.queues.values()):
+            await queue.join()
+
+        for task in self.tasks.values():
+            task.cancel()
+
+        # Clients and the rate limiter are bound to this loop
+        await binance_clients.close()
+        await exchange_info.close()
+        await exchange_rate_limiter.close()
+
+    @contextmanager
+    def batch(self, pair: str):
+        # Intents of the pair submitted inside the block are sent together when it exits
+        if not self.netting:
+            yield
+            return
+
+        with self.batches_lock:
+            self.batches[pair] = []
+
+        try:
+            yield
+        finally:
+            with self.batches_lock:
+                intents = self.batches.pop(pair)
+
+            if intents:
+                self.submit_many(intents)
+
+    def submit(self, intent: OrderIntent) -> None:
+        with self.batches_lock:
+            batch = self.batches.get(intent.bot.pair)
+            if batch is not None:
+                batch.append(intent)
+                return
+
+        self.submit_many([intent])
+
+    def submit_many(self, intents: list[OrderIntent]) -> None:
+        if self.loop is None:
+            for intent in intents:
+                logging.error(f'OrderExecutor is not started, order of bot={intent.bot} is cancelled')
+                intent.bot.cancel_order(intent)
+            return
+
+        self.submitted += len(intents)
+        self.loop.call_soon_threadsafe(self.enqueue, intents)
+
+    def enqueue(self, intents: list[OrderIntent]) -> None:
+        pair = intents[0].bot.pair
+        queue = self.queues.get(pair)
+        if queue is None:
+            queue = self.queues[pair] = asyncio.Queue()
+            self.tasks[pair] = asyncio.create_task(self.run_pair(queue))
+
+        queue.put_nowait(intents)
+
+    async def run_pair(self, queue: asyncio.Queue) -> None:
+        while True:
+            intents = await queue.get()
+            try:
+                async with self.semaphore:
+                    if len(intents) == 1:
+                        await self.execute(intents[0])
+                        continue
+
+                    key_intents: dict[int, list[OrderIntent]] = {}
+                    for intent in intents:
+                        key_intents.setdefault(intent.bot.key_id, []).append(intent)
+
+                    for group in key_intents.values():
+                        if len(group) == 1:
+                            await self.execute(group[0])
+                        else:
+                            await self.execute_netted(group)
+            finally:
+                queue.task_done()
+
+    async def execute(self, intent: OrderIntent) -> None:
+        bot = intent.bot
+        db = SessionLocal()
+        try:
+            if intent.action == BotAction.BUY:
+                order = await buy_pair(bot.pair, bot.key_id, quote_asset_quantity=intent.quote_amount, db=db,
+                                       priority=get_priority(intent))
+                base_amount, quote_amount = order['base_asset_bought'], order['quote_asset_sold']
+            else:
+                order = await sell_pair(bot.pair, bot.key_id, quote_asset_quantity=intent.quote_amount, db=db,
+                                        priority=get_priority(intent), price=intent.price)
+                base_amount, quote_amount = order['base_asset_sold'], order['quote_asset_bought']
+        except Exception:
+            logging.exception(f'OrderExecutor | order {intent.action.name} of bot={bot} failed')
+            self.failed += 1
+            await asyncio.to_thread(self.reconcile, bot.cancel_order, intent)
+            return
+        finally:
+            db.close()
+
+        self.filled += 1
+        self.exchange_orders += 1
+        self.update_latency(intent)
+
+        await asyncio.to_thread(self.reconcile, bot.apply_fill, intent, order['price'], base_amount, quote_amount)
+
+    async def execute_netted(self, intents: list[OrderIntent]) -> None:
+        # Intents share pair and key
+        pair, key_id = intents[0].bot.pair, intents[0].bot.key_id
+        net_order = net_intents(intents)
+        priority = min(get_priority(intent) for intent in intents)
+
+        # Fully crossed intents are filled at the price they were made at
+        price, base_amount, quote_amount = intents[-1].price, 0., 0.
+        db = SessionLocal()
+        try:
+            if net_order.action == BotAction.BUY:
+                order = await buy_pair(pair, key_id, quote_asset_quantity=net_order.quote_amount, db=db,
+                                       priority=priority)
+                price, base_amount, quote_amount = order['price'], order['base_asset_bought'], order['quote_asset_sold']
+            elif net_order.action == BotAction.SELL:
+                order = await sell_pair(pair, key_id, quote_asset_quantity=net_order.quote_amount, db=db,
+                                        priority=priority, price=price)
+                price, base_amount, quote_amount = order['price'], order['base_asset_sold'], order['quote_asset_bought']
+        except Exception:
+            logging.exception(f'OrderExecutor | net order {net_order.action.name} of {len(intents)} intents '
+                              f'on pair={pair} failed')
+            self.failed += len(intents)
+            for intent in intents:
+                await asyncio.to_thread(self.reconcile, intent.bot.cancel_order, intent)
+            return
+        finally:
+            db.close()
+
+        self.filled += len(intents)
+        if net_order.action is not None:
+            self.exchange_orders += 1
+        for intent in intents:
+            self.update_latency(intent)
+
+        allocations = allocate_fill(intents, net_order.action, price, base_amount, quote_amount)
+        for intent, (intent_base_amount, intent_quote_amount) in zip(intents, allocations):
+            await asyncio.to_thread(self.reconcile, intent.bot.apply_fill, intent, price,
+                                    intent_base_amount, intent_quote_amount)
+
+    def update_latency(self, intent: OrderIntent) -> None:
+        self.last_latency = time.time() - intent.created_at
+        self.max_latency = max(self.max_latency, self.last_latency)
+
+    def reconcile(self, apply: Callable, *args) -> None:
+        lock = self.bot_lock_provider(args[0].bot.id)
+        if lock is None:
+            apply(*args)
+        else:
+            with lock:
+                apply(*args)
+
+    def in_flight(self) -> int:
+        return self.submitted - self.filled - self.failed
+
+    def stats(self) -> dict:
+        return {
+            'submitted': self.submitted,
+            'filled': self.filled,
+            'failed': self.failed,
+            'exchange_orders': self.exchange_orders,
+            'in_flight': self.in_flight(),
+            'last_latency': self.last_latency,
+            'max_latency': self.max_latency,
+            'clients': binance_clients.stats(),
+            'rate_limiter': exchange_rate_limiter.stats(),
+            'exchange_info': exchange_info.stats()
+        }
+
+
+order_executor = OrderExecutor(ORDER_EXECUTOR_MAX_CONCURRENCY, ORDER_NETTING_ENABLED)
@@ -0,0 +1,65 @@
+from typing import NamedTuple, Sequence
+
+from algorithms.bots.base_enums import BotAction
+
+
+class NetOrder(NamedTuple):
+    # None when buys and sells cancel each other out and nothing is sent to the exchange
+    action: BotAction | None
+    quote_amount: float
+
+
+def net_intents(intents: Sequence) -> NetOrder:
+    buy_amount = sum(intent.quote_amount for intent in intents if intent.action == BotAction.BUY)
+    sell_amount = sum(intent.quote_amount for intent in intents if intent.action == BotAction.SELL)
+
+    if buy_amount > sell_amount:
+        return NetOrder(BotAction.BUY, buy_amount - sell_amount)
+    if sell_amount > buy_amount:
+        return NetOrder(BotAction.SELL, sell_amount - buy_amount)
+
+    return NetOrder(None, 0.)
+
+
+def split_pro_rata(total: float, weights: list[float]) -> list[float]:
+    # The last share takes the rounding remainder, so shares always sum to the total exactly
+    weights_sum = sum(weights)
+    if not weights_sum:
+        weights, weights_sum = [1.] * len(weights), len(weights)
+
+    shares = [total * weight / weights_sum for weight in weights[:-1]]
+    shares.append(total - sum(shares))
+    return shares
+
+
+def allocate_fill(intents: Sequence, net_action: BotAction | None, price: float,
+                  base_amount: float = 0., quote_amount: float = 0.) -> list[tuple[float, float]]:
+    """
+    Splits fill of a net order between intents it was made of.
+
+    Intents on the opposite side of the net order are crossed with the net side internally at the fill price.
+    Intents on the net side share the exchange fill plus the crossed amounts pro rata to their quote amounts.
+
+    Returns (base_amount, quote_amount) for every intent, in the same order as intents.
+    """
+    allocations = [(0., 0.)] * len(intents)
+
+    net_side = []
+    crossed_base_amount = crossed_quote_amount = 0.
+    for i, intent in enumerate(intents):
+        if intent.action == net_action:
+            net_side.append(i)
+            continue
+
+        allocations[i] = (intent.quote_amount / price, intent.quote_amount)
+        crossed_base_amount += intent.quote_amount / price
+        crossed_quote_amount += intent.quote_amount
+
+    if net_side:
+        weights = [intents[i].quote_amount for i in net_side]
+        base_amounts = split_pro_rata(base_amount + crossed_base_amount, weights)
+        quote_amounts = split_pro_rata(quote_amount + crossed_quote_amount, weights)
+        for i, intent_base_amount, intent_quote_amount in zip(net_side, base_amounts, quote_amounts):
+            allocations[i] = (intent_base_amount, intent_quote_amount)
+
+    return allocations
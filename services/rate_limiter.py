@@ -0,0 +1,236 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from enum import IntEnum
+from typing import Callable, Awaitable, Any
+from binance.exceptions import BinanceAPIException
+
+from config.settings import EXCHANGE_REQUEST_WEIGHT_PER_MINUTE, EXCHANGE_ORDERS_PER_10_SECONDS, \
+    EXCHANGE_ORDERS_PER_DAY, EXCHANGE_QUEUE_TIMEOUT
+from exceptions.exchange_exceptions import RateLimitTimeoutError
+
+
+class RequestPriority(IntEnum):
+    # Lower value is served first
+    STOP_OUT = 0
+    SELL = 1
+    BUY = 2
+    ACCOUNT = 3
+
+
+# Request weights of exchange endpoints
+REQUEST_WEIGHTS = {
+    'order': 1,
+    'account': 20,
+    'exchange_info': 20
+}
+
+
+class TokenBucket:
+    def __init__(self, capacity: float, period: float):
+        self.capacity = capacity
+        self.rate = capacity / period
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    def refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        # Seconds until amount of tokens is available
+        self.refill(now)
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.
+
+        return (amount - self.tokens) / self.rate
+
+    def take(self, amount: float) -> None:
+        self.tokens -= min(amount, self.capacity)
+
+    def drain(self, now: float) -> None:
+        self.refill(now)
+        self.tokens = 0.
+
+
+class ExchangeRateLimiter:
+    """
+    Shared scheduler of exchange calls: request weight is limited for all calls together
+    and number of orders is limited per key, both with token buckets.
+
+    Waiting requests are granted in order of priority (sells and stop-outs first) and fail
+    with RateLimitTimeoutError when they can't be sent within the queue timeout.
+    Should be used from a single event loop (order executor's one).
+    """
+
+    def __init__(self, weight_per_minute: int, orders_per_10_seconds: int, orders_per_day: int, queue_timeout: float):
+        self.weight_per_minute = weight_per_minute
+        self.orders_per_10_seconds = orders_per_10_seconds
+        self.orders_per_day = orders_per_day
+        self.queue_timeout = queue_timeout
+
+        self.weight_bucket = TokenBucket(weight_per_minute, 60)
+        # key_id -> (10 seconds bucket, day bucket)
+        self.order_buckets: dict[int, tuple[TokenBucket, TokenBucket]] = {}
+
+        # Heap of (priority, sequence number, weight, key_id, orders, future)
+        self.waiters = []
+        self.sequence = itertools.count()
+        self.wake_event = None
+        self.task = None
+        # Nothing is sent until then after the exchange responded with 429 or 418
+        self.paused_until = 0.
+
+        # Counters
+        self.granted = 0
+        self.timed_out = 0
+        self.rate_limited = 0
+        self.total_wait = 0.
+        self.max_wait = 0.
+
+    def get_order_buckets(self, key_id: int) -> tuple[TokenBucket, TokenBucket]:
+        buckets = self.order_buckets.get(key_id)
+        if buckets is None:
+            buckets = self.order_buckets[key_id] = (TokenBucket(self.orders_per_10_seconds, 10),
+                                                    TokenBucket(self.orders_per_day, 24 * 60 * 60))
+
+        return buckets
+
+    def start(self) -> None:
+        if self.task is None:
+            self.wake_event = asyncio.Event()
+            self.task = asyncio.create_task(self.schedule())
+
+    async def acquire(self, request: str, key_id: int = None, priority: RequestPriority = RequestPriority.BUY,
+                      timeout: float = None) -> None:
+        self.start()
+
+        orders = 1 if request == 'order' else 0
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self.waiters, (priority, next(self.sequence), REQUEST_WEIGHTS[request], key_id, orders, future))
+        self.wake_event.set()
+
+        timeout = self.queue_timeout if timeout is None else timeout
+        started_at = time.monotonic()
+        try:
+            await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            raise RateLimitTimeoutError(f'Request {request} waited for exchange rate limits longer than {timeout}s')
+
+        wait = time.monotonic() - started_at
+        self.granted += 1
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+
+    async def call(self, request: str, method: Callable[..., Awaitable[Any]], *args, key_id: int = None,
+                   priority: RequestPriority = RequestPriority.BUY, **kwargs):
+        await self.acquire(request, key_id, priority)
+
+        try:
+            return await method(*args, **kwargs)
+        except BinanceAPIException as e:
+            if e.status_code in (418, 429):
+                retry_after = (e.response.headers.get('Retry-After') if e.response is not None else None) or 60
+                self.on_rate_limited(float(retry_after))
+            raise
+
+    def on_rate_limited(self, retry_after: float) -> None:
+        logging.warning(f'ExchangeRateLimiter | rate limited by exchange, pause for {retry_after}s')
+        now = time.monotonic()
+        self.rate_limited += 1
+        self.paused_until = max(self.paused_until, now + retry_after)
+        self.weight_bucket.drain(now)
+
+    def grant(self) -> float | None:
+        # Grants waiters which fit the limits in order of priority, returns seconds until the next grant is possible
+        now = time.monotonic()
+        if now < self.paused_until:
+            return self.paused_until - now if self.waiters else None
+
+        delay = None
+        blocked_key_ids = set()
+        remaining = []
+        while self.waiters:
+            waiter = heapq.heappop(self.waiters)
+            _, _, weight, key_id, orders, future = waiter
+            if future.done():
+                # Timed out
+                continue
+
+            # Keep order of requests of one key
+            if key_id in blocked_key_ids:
+                remaining.append(waiter)
+                continue
+
+            order_wait = 0.
+            if orders:
+                order_wait = max(bucket.wait_time(orders, now) for bucket in self.get_order_buckets(key_id))
+            if order_wait > 0:
+                # Only this key is out of orders, requests of other keys can go
+                blocked_key_ids.add(key_id)
+                remaining.append(waiter)
+                delay = order_wait if delay is None else min(delay, order_wait)
+                continue
+
+            weight_wait = self.weight_bucket.wait_time(weight, now)
+            if weight_wait > 0:
+                # Weight is shared, requests with lower priority wait too
+                remaining.append(waiter)
+                delay = weight_wait if delay is None else min(delay, weight_wait)
+                break
+
+            self.weight_bucket.take(weight)
+            if orders:
+                for bucket in self.get_order_buckets(key_id):
+                    bucket.take(orders)
+            future.set_result(None)
+
+        for waiter in remaining:
+            heapq.heappush(self.waiters, waiter)
+
+        return delay
+
+    async def schedule(self) -> None:
+        while True:
+            self.wake_event.clear()
+            delay = self.grant()
+
+            try:
+                await asyncio.wait_for(self.wake_event.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+
+    async def close(self) -> None:
+        if self.task is None:
+            return
+
+        self.task.cancel()
+        try:
+            await self.task
+        except asyncio.CancelledError:
+            pass
+
+        for *_, future in self.waiters:
+            future.cancel()
+        self.waiters.clear()
+        self.task = None
+        self.wake_event = None
+
+    def stats(self) -> dict:
+        return {
+            'waiting': sum(1 for *_, future in self.waiters if not future.done()),
+            'granted': self.granted,
+            'timed_out': self.timed_out,
+            'rate_limited': self.rate_limited,
+            'average_wait': self.total_wait / self.granted if self.granted else 0.,
+            'max_wait': self.max_wait,
+            'weight_available': self.weight_bucket.tokens
+        }
+
+
+exchange_rate_limiter = ExchangeRateLimiter(EXCHANGE_REQUEST_WEIGHT_PER_MINUTE, EXCHANGE_ORDERS_PER_10_SECONDS,
+                                            EXCHANGE_ORDERS_PER_DAY, EXCHANGE_QUEUE_TIMEOUT)
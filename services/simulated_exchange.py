@@ -0,0 +1,275 @@
+import asyncio
+import itertools
+import json
+import random
+import threading
+import time
+from binance.exceptions import BinanceAPIException
+
+from config.settings import SIMULATED_EXCHANGE_LATENCY, SIMULATED_EXCHANGE_FEE, \
+    SIMULATED_EXCHANGE_PARTIAL_FILL_PROBABILITY, SIMULATED_EXCHANGE_BOOK_DEPTH, SIMULATED_EXCHANGE_INITIAL_BALANCE, \
+    SIMULATED_EXCHANGE_REPLENISH_TIME
+from api.data_api.preprocessing import split_pair, float_to_str
+from services.metadata_cache import KeyInfo
+from services.binance_clients import binance_clients
+from services.exchange_info import exchange_info
+
+
+def api_error(code: int, message: str, status_code: int = 400) -> BinanceAPIException:
+    return BinanceAPIException(None, status_code, json.dumps({'code': code, 'msg': message}))
+
+
+class OrderBook:
+    """
+    Order book around the latest price: depth levels on each side, every level holds the same quote value.
+    Orders consume its liquidity, taken liquidity comes back linearly within replenish_time seconds,
+    so the book keeps up with a steady order flow between prices.
+    """
+
+    def __init__(self, price: float, depth: int, spread: float, level_step: float, level_quote_size: float,
+                 replenish_time: float):
+        self.price = price
+        self.replenish_time = replenish_time
+        self.replenished_at = time.monotonic()
+
+        # Levels are [price, quantity, full quantity]
+        self.asks = []
+        self.bids = []
+        for level in range(depth):
+            ask_price = price * (1 + spread / 2 + level * level_step)
+            bid_price = price * (1 - spread / 2 - level * level_step)
+            self.asks.append([ask_price, level_quote_size / ask_price, level_quote_size / ask_price])
+            self.bids.append([bid_price, level_quote_size / bid_price, level_quote_size / bid_price])
+
+    def replenish(self, now: float) -> None:
+        elapsed = now - self.replenished_at
+        self.replenished_at = now
+        if elapsed <= 0:
+            return
+
+        fraction = elapsed / self.replenish_time if self.replenish_time > 0 else 1.
+        for level in self.asks + self.bids:
+            level[1] = min(level[2], level[1] + level[2] * fraction)
+
+    def match(self, levels: list[list[float]], quantity: float = None, quote_quantity: float = None) \
+            -> list[tuple[float, float]]:
+        # (price, quantity) fills of a market order, liquidity is taken only when the order is committed
+        fills = []
+        for price, level_quantity, _ in levels:
+            if quantity is not None:
+                fill_quantity = min(level_quantity, quantity)
+                quantity -= fill_quantity
+            else:
+                fill_quantity = min(level_quantity, quote_quantity / price)
+                quote_quantity -= fill_quantity * price
+
+            if fill_quantity > 0:
+                fills.append((price, fill_quantity))
+            if (quantity if quantity is not None else quote_quantity) <= 1e-12:
+                break
+
+        return fills
+
+    @staticmethod
+    def take(levels: list[list[float]], fills: list[tuple[float, float]]) -> None:
+        # Prices of levels on a side are distinct, empty levels are kept to be replenished
+        fill_quantities = dict(fills)
+        for level in levels:
+            level[1] = max(0., level[1] - fill_quantities.get(level[0], 0.))
+
+
+class SimulatedExchange:
+    """
+    In-process exchange which executes market orders against order books built around the latest tick prices.
+
+    Models latency, fees (taken from the received asset like Binance does), partial fills
+    and per-key balances. Every shard process runs its own simulator fed with ticks of its pairs,
+    so balances of a key are separate per process.
+    """
+
+    def __init__(self, latency: float = SIMULATED_EXCHANGE_LATENCY, fee: float = SIMULATED_EXCHANGE_FEE,
+                 partial_fill_probability: float = SIMULATED_EXCHANGE_PARTIAL_FILL_PROBABILITY,
+                 book_depth: int = SIMULATED_EXCHANGE_BOOK_DEPTH, spread: float = 0.0005, level_step: float = 0.0002,
+                 level_quote_size: float = 10_000, replenish_time: float = SIMULATED_EXCHANGE_REPLENISH_TIME,
+                 initial_balance: float = SIMULATED_EXCHANGE_INITIAL_BALANCE):
+        self.latency = latency
+        self.fee = fee
+        self.partial_fill_probability = partial_fill_probability
+        self.book_depth = book_depth
+        self.spread = spread
+        self.level_step = level_step
+        self.level_quote_size = level_quote_size
+        self.replenish_time = replenish_time
+        self.initial_balance = initial_balance
+
+        # Prices come from the tick handlers, orders from the order executor thread
+        self.lock = threading.Lock()
+        self.books: dict[str, OrderBook] = {}
+        self.balances: dict[int, dict[str, float]] = {}
+        self.order_ids = itertools.count(1)
+
+        # Counters
+        self.orders = 0
+        self.partially_filled = 0
+        self.rejected = 0
+
+    def set_price(self, symbol: str, price: float) -> None:
+        book = OrderBook(price, self.book_depth, self.spread, self.level_step, self.level_quote_size,
+                         self.replenish_time)
+        with self.lock:
+            self.books[symbol] = book
+
+    def get_balances(self, key_id: int) -> dict[str, float]:
+        balances = self.balances.get(key_id)
+        if balances is None:
+            # Every key starts with initial balance of every quote asset
+            balances = self.balances[key_id] = {'USDT': self.initial_balance, 'BTC': self.initial_balance,
+                                                'ETH': self.initial_balance}
+
+        return balances
+
+    async def wait(self) -> None:
+        if self.latency:
+            await asyncio.sleep(random.uniform(0.5, 1.5) * self.latency)
+
+    def execute(self, key_id: int, symbol: str, side: str, quantity: float = None, quote_quantity: float = None) -> dict:
+        base_asset, quote_asset = split_pair(symbol)
+
+        with self.lock:
+            book = self.books.get(symbol)
+            if book is None:
+                self.rejected += 1
+                raise api_error(-1121, 'Invalid symbol.')
+
+            requested = quantity if quantity is not None else quote_quantity
+
+            # Only a part of the order finds liquidity
+            if random.random() < self.partial_fill_probability:
+                fraction = random.uniform(0.1, 0.9)
+                quantity = quantity * fraction if quantity is not None else None
+                quote_quantity = quote_quantity * fraction if quote_quantity is not None else None
+
+            book.replenish(time.monotonic())
+            levels = book.asks if side == 'BUY' else book.bids
+            fills = book.match(levels, quantity, quote_quantity)
+
+            # Market order which finds no liquidity at all is rejected, not reported as a partial fill
+            if not fills:
+                self.rejected += 1
+                raise api_error(-2010, 'Order book has no liquidity for the order.')
+            executed_quantity = sum(fill_quantity for _, fill_quantity in fills)
+            executed_quote_quantity = sum(price * fill_quantity for price, fill_quantity in fills)
+
+            balances = self.get_balances(key_id)
+            if side == 'BUY' and executed_quote_quantity > balances.get(quote_asset, 0.) or \
+                    side == 'SELL' and executed_quantity > balances.get(base_asset, 0.):
+                self.rejected += 1
+                raise api_error(-2010, 'Account has insufficient balance for requested action.')
+
+            book.take(levels, fills)
+
+            # Commission is charged in the received asset
+            if side == 'BUY':
+                balances[quote_asset] -= executed_quote_quantity
+                balances[base_asset] = balances.get(base_asset, 0.) + executed_quantity * (1 - self.fee)
+            else:
+                balances[base_asset] -= executed_quantity
+                balances[quote_asset] = balances.get(quote_asset, 0.) + executed_quote_quantity * (1 - self.fee)
+
+            executed = executed_quantity if quantity is not None else executed_quote_quantity
+            is_filled = executed >= requested * (1 - 1e-9)
+
+            self.orders += 1
+            if not is_filled:
+                self.partially_filled += 1
+
+        commission_asset = base_asset if side == 'BUY' else quote_asset
+        return {
+            'symbol': symbol,
+            'orderId': next(self.order_ids),
+            'transactTime': int(time.time() * 1000),
+            'type': 'MARKET',
+            'side': side,
+            'status': 'FILLED' if is_filled else 'EXPIRED',
+            'executedQty': float_to_str(executed_quantity),
+            'cummulativeQuoteQty': float_to_str(executed_quote_quantity),
+            'fills': [{
+                'price': float_to_str(price),
+                'qty': float_to_str(fill_quantity),
+                'commission': float_to_str(fill_quantity * self.fee if side == 'BUY'
+                                           else fill_quantity * price * self.fee),
+                'commissionAsset': commission_asset
+            } for price, fill_quantity in fills]
+        }
+
+    def get_exchange_info(self) -> dict:
+        with self.lock:
+            symbols = list(self.books)
+
+        exchange_symbols = []
+        for symbol in symbols:
+            base_asset, quote_asset = split_pair(symbol)
+            exchange_symbols.append({
+                'symbol': symbol,
+                'baseAsset': base_asset,
+                'quoteAsset': quote_asset,
+                'quoteAssetPrecision': 8,
+                'filters': [{'filterType': 'LOT_SIZE', 'minQty': '0', 'maxQty': '0', 'stepSize': '0.00000001'}]
+            })
+
+        return {'symbols': exchange_symbols}
+
+    def stats(self) -> dict:
+        return {
+            'symbols': len(self.books),
+            'orders': self.orders,
+            'partially_filled': self.partially_filled,
+            'rejected': self.rejected
+        }
+
+
+class SimulatedClient:
+    # Subset of binance AsyncClient used by buy_sell and exchange info
+    def __init__(self, exchange: SimulatedExchange, key_id: int = None):
+        self.exchange = exchange
+        self.key_id = key_id
+
+    async def get_account(self) -> dict:
+        await self.exchange.wait()
+        with self.exchange.lock:
+            balances = dict(self.exchange.get_balances(self.key_id))
+
+        return {'balances': [{'asset': asset, 'free': float_to_str(free), 'locked': '0'}
+                             for asset, free in balances.items()]}
+
+    async def order_market_buy(self, symbol: str, quantity: str = None, quoteOrderQty: str = None) -> dict:
+        await self.exchange.wait()
+        return self.exchange.execute(self.key_id, symbol, 'BUY', quantity=float(quantity) if quantity else None,
+                                     quote_quantity=float(quoteOrderQty) if quoteOrderQty else None)
+
+    async def order_market_sell(self, symbol: str, quantity: str = None, quoteOrderQty: str = None) -> dict:
+        await self.exchange.wait()
+        return self.exchange.execute(self.key_id, symbol, 'SELL', quantity=float(quantity) if quantity else None,
+                                     quote_quantity=float(quoteOrderQty) if quoteOrderQty else None)
+
+    async def get_exchange_info(self) -> dict:
+        await self.exchange.wait()
+        return self.exchange.get_exchange_info()
+
+    async def close_connection(self) -> None:
+        pass
+
+
+def use_simulated_exchange(exchange: SimulatedExchange) -> None:
+    # Routes exchange clients of this process to the simulator
+    async def create_client(key: KeyInfo) -> SimulatedClient:
+        return SimulatedClient(exchange, key.id)
+
+    async def create_public_client() -> SimulatedClient:
+        return SimulatedClient(exchange)
+
+    binance_clients.client_factory = create_client
+    exchange_info.client_factory = create_public_client
+
+
+simulated_exchange = SimulatedExchange()
@@ -0,0 +1,60 @@
+from sqlalchemy import update, case, literal
+from sqlalchemy.orm.session import Session
+
+from config.settings import BOT_STATUS_BATCH_SIZE, BOT_STATUS_FLUSH_INTERVAL
+from models.models_ import Bot
+from algorithms.bots.base_enums import BotStatus
+from services.batch_writer import BackgroundBatchWriter
+
+
+class BotStatusWriter(BackgroundBatchWriter):
+    """
+    Coalesces status changes of bots and writes them with one UPDATE per flush.
+
+    Only the latest status of every bot is kept. In-memory status of the bot stays authoritative,
+    db is eventually consistent with it.
+    """
+
+    name = 'bot-status-writer'
+
+    def __init__(self, batch_size: int, flush_interval: float):
+        super().__init__(batch_size, flush_interval)
+        self.statuses: dict[int, BotStatus] = {}
+
+    def set(self, bot_id: int, status: BotStatus) -> None:
+        with self.lock:
+            self.statuses[bot_id] = status
+            size = len(self.statuses)
+
+        if size >= self.batch_size:
+            self.wake_up()
+
+    def get(self, bot_id: int) -> BotStatus | None:
+        return self.statuses.get(bot_id)
+
+    def take_batch(self) -> list[tuple[int, BotStatus]]:
+        batch = list(self.statuses.items())
+        self.statuses = {}
+        return batch
+
+    def write(self, batch: list[tuple[int, BotStatus]], db: Session) -> None:
+        # UPDATE "Bots" SET status = CASE id WHEN ... END WHERE id IN (...)
+        statuses = {bot_id: literal(status, Bot.status.type) for bot_id, status in batch}
+        db.execute(update(Bot)
+                   .where(Bot.id.in_(statuses.keys()))
+                   .values(status=case(statuses, value=Bot.id))
+                   .execution_options(synchronize_session=False))
+
+    def on_failure(self, batch: list[tuple[int, BotStatus]]) -> None:
+        super().on_failure(batch)
+
+        # Retry with the next flush unless status has changed since then
+        with self.lock:
+            for bot_id, status in batch:
+                self.statuses.setdefault(bot_id, status)
+
+    def pending_size(self) -> int:
+        return len(self.statuses)
+
+
+bot_status_writer = BotStatusWriter(BOT_STATUS_BATCH_SIZE, BOT_STATUS_FLUSH_INTERVAL)
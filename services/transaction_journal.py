@@ -0,0 +1,75 @@
+import logging
+import threading
+from sqlalchemy import insert
+from sqlalchemy.orm.session import Session
+
+from config.settings import TRANSACTION_JOURNAL_BATCH_SIZE, TRANSACTION_JOURNAL_FLUSH_INTERVAL
+from models.models_ import Bot, Transaction
+from services.batch_writer import BackgroundBatchWriter
+
+
+class TransactionJournal(BackgroundBatchWriter):
+    """
+    In-memory journal of bot trades, persisted to the Transactions table in batched inserts.
+
+    Rows stay visible through pending() until they are committed, so readers see their own writes.
+    Readers of db and pending() should hold commit_lock across both reads, otherwise a commit between them
+    makes rows missing or duplicated.
+    """
+
+    name = 'transaction-journal'
+
+    def __init__(self, batch_size: int, flush_interval: float):
+        super().__init__(batch_size, flush_interval)
+        self.rows: list[dict] = []
+        self.in_flight: list[dict] = []
+        # Commit of a batch and its removal from in_flight are atomic for readers
+        self.commit_lock = threading.Lock()
+
+    def append(self, row: dict) -> None:
+        with self.lock:
+            self.rows.append(row)
+            size = len(self.rows)
+
+        if size >= self.batch_size:
+            self.wake_up()
+
+    def take_batch(self) -> list[dict]:
+        batch, self.rows = self.rows, []
+        self.in_flight = batch
+        return batch
+
+    def write(self, batch: list[dict], db: Session) -> None:
+        # Bots could be deleted while their trades were pending
+        bot_ids = {row['bot_id'] for row in batch}
+        existing_bot_ids = {bot_id for bot_id, in db.query(Bot.id).filter(Bot.id.in_(bot_ids)).all()}
+        rows = [row for row in batch if row['bot_id'] in existing_bot_ids]
+        if len(rows) != len(batch):
+            logging.info(f'TransactionJournal | skip {len(batch) - len(rows)} transactions of deleted bots')
+
+        if rows:
+            db.execute(insert(Transaction), rows)
+
+    def commit(self, batch: list[dict], db: Session) -> None:
+        with self.commit_lock:
+            db.commit()
+            with self.lock:
+                self.in_flight = []
+
+    def on_failure(self, batch: list[dict]) -> None:
+        super().on_failure(batch)
+
+        # Keep rows to retry them with the next flush
+        with self.lock:
+            self.rows = batch + self.rows
+            self.in_flight = []
+
+    def pending_size(self) -> int:
+        return len(self.rows)
+
+    def pending(self, bot_id: int) -> list[dict]:
+        with self.lock:
+            return [row for row in self.in_flight + self.rows if row['bot_id'] == bot_id]
+
+
+transaction_journal = TransactionJournal(TRANSACTION_JOURNAL_BATCH_SIZE, TRANSACTION_JOURNAL_FLUSH_INTERVAL)
@@ -0,0 +1,41 @@
+import threading
+import numpy as np
+import pytest
+
+from algorithms.bots.base_enums import ReturnType
+from algorithms.optimization.sma_search import search_moving_windows, search_moving_windows_halving
+
+
+def get_prices(size: int) -> np.ndarray:
+    rng = np.random.default_rng(size)
+    return 30_000 * np.exp(np.cumsum(rng.normal(0, 0.001, size)))
+
+
+def run_with_timeout(function, timeout: float = 30.):
+    # A hanging search fails the test instead of hanging the run
+    results = []
+    thread = threading.Thread(target=lambda: results.append(function()), daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), f'Search did not finish in {timeout}s'
+    return results[0]
+
+
+@pytest.mark.parametrize('size', [2, 10, 50, 60, 80, 81, 200])
+@pytest.mark.parametrize('return_type', [ReturnType.LOG_RETURN, ReturnType.RETURN])
+def test_halving_on_short_history_matches_exhaustive(size, return_type):
+    prices = get_prices(size)
+    bounds = dict(fast_min=1, fast_max=100, slow_max=150, fast_slow_min_delta=1)
+
+    best = run_with_timeout(lambda: search_moving_windows_halving(prices, return_type, eta=3, rungs=4, **bounds))
+
+    # Histories shorter than a few slowest windows are not split into rungs
+    assert best == search_moving_windows(prices, return_type, **bounds)
+    assert best.slow_window is not None and best.slow_window <= size
+
+
+def test_halving_on_one_price_finds_nothing():
+    best = run_with_timeout(lambda: search_moving_windows_halving(get_prices(1), ReturnType.LOG_RETURN, fast_min=1,
+                                                                  fast_max=100, slow_max=150,
+                                                                  fast_slow_min_delta=1))
+    assert best.slow_window is None